@@ -1,19 +1,24 @@
 import frappe
 from frappe import _
-from company_management.company_management.auth.security import require_permission, filter_by_user_company
+from company_management.company_management.auth.security import require_permission, filter_by_user_company, can_access_company_data
+from company_management.company_management.utils.cache import get_cached_company_stats_batch
+from company_management.company_management.utils.pagination import paginate, paginated_response
+
+MAX_STATS_BATCH_SIZE = 1000
 
 @frappe.whitelist(allow_guest=False)
 @require_permission("Company", "read")
-def get_companies():
-    """Get all companies"""
+def get_companies(cursor=None, page_size=None):
+    """Get companies, one page at a time"""
     try:
         filters = filter_by_user_company("Company")
-        companies = frappe.get_all('Company', 
-                                 filters=filters,
-                                 fields=['name', 'company_name', 'number_of_departments', 
-                                        'number_of_employees', 'number_of_projects',
-                                        'email', 'phone', 'website'])
-        return {"success": True, "data": companies}
+        companies, next_cursor = paginate('Company',
+                                        filters=filters,
+                                        fields=['name', 'company_name', 'number_of_departments', 
+                                               'number_of_employees', 'number_of_projects',
+                                               'email', 'phone', 'website'],
+                                        cursor=cursor, page_size=page_size)
+        return paginated_response(companies, next_cursor)
     except Exception as e:
         frappe.log_error(f"Error fetching companies: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -66,4 +71,37 @@ def delete_company(name):
         return {"success": True, "message": "Company deleted successfully"}
     except Exception as e:
         frappe.log_error(f"Error deleting company {name}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['GET', 'POST'])
+@require_permission("Company", "read")
+def get_companies_stats(companies=None):
+    """Get statistics for a list of companies, or all companies visible to the user"""
+    try:
+        if companies:
+            companies = frappe.parse_json(companies)
+            if isinstance(companies, str):
+                companies = [companies]
+            denied = [company for company in companies if not can_access_company_data(company)]
+            if denied:
+                return {"success": False, "error": f"Access denied for companies: {', '.join(denied)}"}
+        
+            companies = list(dict.fromkeys(companies))
+            if len(companies) > MAX_STATS_BATCH_SIZE:
+                return {"success": False, "error": f"At most {MAX_STATS_BATCH_SIZE} companies can be requested at once"}
+            
+            # Unknown names would otherwise be cached as all-zero stats
+            visible = set(frappe.get_list('CM Company', filters={'name': ['in', companies]},
+                                          pluck='name', limit_page_length=0))
+            companies = [company for company in companies if company in visible]
+        else:
+            # Company scoping is added by the CM Company permission query conditions
+            companies = frappe.get_list('CM Company', pluck='name', limit_page_length=0)
+            if len(companies) > MAX_STATS_BATCH_SIZE:
+                return {"success": False, "error": f"At most {MAX_STATS_BATCH_SIZE} companies can be requested at once"}
+        
+        stats = get_cached_company_stats_batch(companies)
+        return {"success": True, "data": stats}
+    except Exception as e:
+        frappe.log_error(f"Error fetching company stats: {str(e)}")
         return {"success": False, "error": str(e)}
\ No newline at end of file
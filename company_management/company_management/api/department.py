@@ -1,18 +1,20 @@
 import frappe
 from frappe import _
 from company_management.company_management.auth.security import require_permission, filter_by_user_company
+from company_management.company_management.utils.pagination import paginate, paginated_response
 
 @frappe.whitelist(allow_guest=False, methods=['GET'])
 @require_permission("Department", "read")
-def get_departments():
-    """Get all departments"""
+def get_departments(cursor=None, page_size=None):
+    """Get departments, one page at a time"""
     try:
         filters = filter_by_user_company("Department")
-        departments = frappe.get_all('Department',
-                                   filters=filters,
-                                   fields=['name', 'department_name', 'company', 'manager',
-                                          'number_of_employees', 'number_of_projects', 'created_date'])
-        return {"success": True, "data": departments}
+        departments, next_cursor = paginate('Department',
+                                          filters=filters,
+                                          fields=['name', 'department_name', 'company', 'manager',
+                                                 'number_of_employees', 'number_of_projects', 'created_date'],
+                                          cursor=cursor, page_size=page_size)
+        return paginated_response(departments, next_cursor)
     except Exception as e:
         frappe.log_error(f"Error fetching departments: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -69,14 +71,15 @@ def delete_department(name):
 
 @frappe.whitelist(allow_guest=False, methods=['GET'])
 @require_permission("Department", "read")
-def get_departments_by_company(company):
-    """Get departments by company"""
+def get_departments_by_company(company, cursor=None, page_size=None):
+    """Get departments by company, one page at a time"""
     try:
-        departments = frappe.get_all('Department',
-                                   filters={'company': company},
-                                   fields=['name', 'department_name', 'manager',
-                                          'number_of_employees', 'number_of_projects'])
-        return {"success": True, "data": departments}
+        departments, next_cursor = paginate('Department',
+                                          filters={'company': company},
+                                          fields=['name', 'department_name', 'manager',
+                                                 'number_of_employees', 'number_of_projects'],
+                                          cursor=cursor, page_size=page_size)
+        return paginated_response(departments, next_cursor)
     except Exception as e:
         frappe.log_error(f"Error fetching departments for company {company}: {str(e)}")
         return {"success": False, "error": str(e)}
\ No newline at end of file
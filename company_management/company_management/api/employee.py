@@ -1,6 +1,7 @@
 import frappe
 from frappe import _
 from company_management.company_management.auth.security import require_permission, filter_by_user_company
+from company_management.company_management.utils.pagination import paginate, paginated_response
 
 @frappe.whitelist(allow_guest=False, methods=['POST'])
 @require_permission("Employee", "create")
@@ -18,16 +19,17 @@ def create_employee():
 
 @frappe.whitelist(allow_guest=False, methods=['GET'])
 @require_permission("Employee", "read")
-def get_employees():
-    """Get all employees"""
+def get_employees(cursor=None, page_size=None):
+    """Get employees, one page at a time"""
     try:
         filters = filter_by_user_company("Employee")
-        employees = frappe.get_all('Employee', 
-                                 filters=filters,
-                                 fields=['name', 'employee_name', 'email_address', 
-                                        'company', 'department', 'designation',
-                                        'phone_number', 'status', 'hired_on', 'days_employed'])
-        return {"success": True, "data": employees}
+        employees, next_cursor = paginate('Employee',
+                                        filters=filters,
+                                        fields=['name', 'employee_name', 'email_address', 
+                                               'company', 'department', 'designation',
+                                               'phone_number', 'status', 'hired_on', 'days_employed'],
+                                        cursor=cursor, page_size=page_size)
+        return paginated_response(employees, next_cursor)
     except Exception as e:
         frappe.log_error(f"Error fetching employees: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -70,15 +72,16 @@ def delete_employee(name):
 
 @frappe.whitelist(allow_guest=False, methods=['GET'])
 @require_permission("Employee", "read")
-def get_employees_by_department(department):
-    """Get employees by department"""
+def get_employees_by_department(department, cursor=None, page_size=None):
+    """Get employees by department, one page at a time"""
     try:
         filters = filter_by_user_company("Employee", {"department": department})
-        employees = frappe.get_all('Employee',
-                                 filters=filters,
-                                 fields=['name', 'employee_name', 'email_address', 
-                                        'designation', 'status'])
-        return {"success": True, "data": employees}
+        employees, next_cursor = paginate('Employee',
+                                        filters=filters,
+                                        fields=['name', 'employee_name', 'email_address', 
+                                               'designation', 'status'],
+                                        cursor=cursor, page_size=page_size)
+        return paginated_response(employees, next_cursor)
     except Exception as e:
         frappe.log_error(f"Error fetching employees for department {department}: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -1,6 +1,22 @@
 import frappe
 from frappe import _
-from company_management.company_management.auth.security import require_permission, filter_by_user_company
+from frappe.utils import add_days, cint, getdate, now_datetime
+from company_management.company_management.auth.security import require_permission, filter_by_user_company, can_access_company_data
+from company_management.company_management.auth.permissions import get_scoped_company
+from company_management.company_management.auth.user_context import get_user_context
+from company_management.company_management.utils.pagination import decode_cursor, encode_cursor, get_page_size, paginate, paginated_response
+from company_management.company_management.utils.transactions import run_after_commit, savepoint
+from company_management.company_management.workflow.engine import get_transition, get_allowed_actions, apply_transition
+from company_management.company_management.workflow.inbox import INBOX_STATES, get_inbox_counts
+from company_management.company_management.workflow.performance_review_workflow import WORKFLOW_STATES
+
+# Reviews transitioned per transaction by bulk_workflow_action
+BULK_ACTION_BATCH_SIZE = 100
+# Larger bulk actions run as a background job
+BULK_ACTION_BACKGROUND_THRESHOLD = 500
+# Per-review results of background bulk actions are kept for polling this long
+BULK_ACTION_RESULTS_KEY_PREFIX = "cm_bulk_workflow_action"
+BULK_ACTION_RESULTS_TTL = 24 * 3600
 
 @frappe.whitelist(allow_guest=False, methods=['POST'])
 @require_permission("Performance Review", "create")
@@ -18,28 +34,16 @@ def create_performance_review():
 
 @frappe.whitelist(allow_guest=False, methods=['GET'])
 @require_permission("Performance Review", "read")
-def get_performance_reviews():
-    """Get all performance reviews"""
-    try:
-        # Filter by user's company through employee
-        user_company = frappe.get_value("User Account", 
-                                       {"email_address": frappe.session.user}, 
-                                       "company")
-        
-        filters = {}
-        if user_company and "Company Admin" not in frappe.get_roles():
-            # Get employees from user's company
-            company_employees = frappe.get_all('Employee', 
-                                             filters={'company': user_company},
-                                             pluck='name')
-            if company_employees:
-                filters['employee'] = ['in', company_employees]
-        
-        reviews = frappe.get_all('Performance Review',
-                               filters=filters,
-                               fields=['name', 'employee', 'review_period_start', 'review_period_end',
-                                      'reviewer', 'overall_rating', 'workflow_state', 'review_date'])
-        return {"success": True, "data": reviews}
+def get_performance_reviews(cursor=None, page_size=None):
+    """Get performance reviews, one page at a time"""
+    try:
+        # Company scoping is added to the query by the Performance Review permission query conditions
+        reviews, next_cursor = paginate('Performance Review',
+                                      method=frappe.get_list,
+                                      fields=['name', 'employee', 'review_period_start', 'review_period_end',
+                                             'reviewer', 'overall_rating', 'workflow_state', 'review_date'],
+                                      cursor=cursor, page_size=page_size)
+        return paginated_response(reviews, next_cursor)
     except Exception as e:
         frappe.log_error(f"Error fetching performance reviews: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -83,99 +87,424 @@ def submit_performance_review(name):
 
 @frappe.whitelist(allow_guest=False, methods=['GET'])
 @require_permission("Performance Review", "read")
-def get_reviews_by_employee(employee):
-    """Get performance reviews for specific employee"""
+def get_reviews_by_employee(employee, year=None, cursor=None, page_size=None):
+    """Get performance reviews for specific employee, one page at a time
+
+    Pass `year` to drill down into one year of the cached performance summary.
+    """
     try:
-        reviews = frappe.get_all('Performance Review',
-                               filters={'employee': employee},
-                               fields=['name', 'review_period_start', 'review_period_end',
-                                      'reviewer', 'overall_rating', 'workflow_state'],
-                               order_by='review_period_end desc')
-        return {"success": True, "data": reviews}
+        filters = {'employee': employee}
+        if year:
+            year = cint(year)
+            filters['review_period_end'] = ['between', [f"{year}-01-01", f"{year}-12-31"]]
+        
+        reviews, next_cursor = paginate('Performance Review',
+                                      filters=filters,
+                                      fields=['name', 'review_period_start', 'review_period_end',
+                                             'reviewer', 'overall_rating', 'workflow_state'],
+                                      cursor=cursor, page_size=page_size,
+                                      sort_field='review_period_end')
+        return paginated_response(reviews, next_cursor)
     except Exception as e:
         frappe.log_error(f"Error fetching reviews for employee {employee}: {str(e)}")
         return {"success": False, "error": str(e)}
 
 @frappe.whitelist(allow_guest=False, methods=['GET'])
 @require_permission("Performance Review", "read")
-def get_pending_reviews():
-    """Get pending performance reviews for current user"""
+def get_pending_reviews(cursor=None, page_size=None):
+    """Get pending performance reviews for current user, one page at a time"""
     try:
         # Get reviews where current user is the reviewer
-        user_email = frappe.session.user
-        employee_name = frappe.get_value('Employee', {'email_address': user_email}, 'name')
+        pending_reviews, next_cursor = get_inbox_page(get_user_context().employee, cursor=cursor, page_size=page_size)
+        return paginated_response(pending_reviews, next_cursor)
+    except Exception as e:
+        frappe.log_error(f"Error fetching pending reviews: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['GET'])
+@require_permission("Performance Review", "read")
+def get_review_inbox_counts():
+    """Get the current user's pending review counts per workflow state (inbox badge)"""
+    try:
+        employee_name = get_user_context().employee
+        counts = get_inbox_counts(employee_name) if employee_name else dict.fromkeys(INBOX_STATES, 0)
+        return {"success": True, "data": {"total": sum(counts.values()), "by_state": counts}}
+    except Exception as e:
+        frappe.log_error(f"Error fetching review inbox counts: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['GET'])
+@require_permission("Performance Review", "read")
+def get_review_inbox(workflow_state=None, cursor=None, page_size=None):
+    """Get the current user's review inbox, optionally for one workflow state, one page at a time"""
+    try:
+        if workflow_state and workflow_state not in INBOX_STATES:
+            return {"success": False, "error": f"Invalid inbox state: {workflow_state}"}
         
+        employee_name = get_user_context().employee
         if not employee_name:
-            return {"success": True, "data": []}
+            return paginated_response([], None)
+        
+        counts = get_inbox_counts(employee_name)
+        reviews, next_cursor = get_inbox_page(employee_name, workflow_state, cursor, page_size)
         
-        pending_reviews = frappe.get_all('Performance Review',
-                                       filters={
-                                           'reviewer': employee_name,
-                                           'workflow_state': ['in', ['Pending Review', 'Review Scheduled', 'Under Approval']]
-                                       },
-                                       fields=['name', 'employee', 'review_period_start', 'review_period_end',
-                                              'workflow_state', 'review_date'])
-        return {"success": True, "data": pending_reviews}
+        response = paginated_response(reviews, next_cursor)
+        response["counts"] = {"total": sum(counts.values()), "by_state": counts}
+        return response
     except Exception as e:
-        frappe.log_error(f"Error fetching pending reviews: {str(e)}")
+        frappe.log_error(f"Error fetching review inbox: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+def get_inbox_page(employee_name, workflow_state=None, cursor=None, page_size=None):
+    """One page of reviews assigned to `employee_name`, served by the (reviewer, workflow_state) index
+
+    Always queried: the cached inbox counters are only a badge hint and may lag.
+    """
+    if not employee_name:
+        return [], None
+    
+    states = [workflow_state] if workflow_state else list(INBOX_STATES)
+    return paginate('Performance Review',
+                    filters={
+                        'reviewer': employee_name,
+                        'workflow_state': ['in', states]
+                    },
+                    fields=['name', 'employee', 'review_period_start', 'review_period_end',
+                           'workflow_state', 'review_date', 'state_entered_at'],
+                    cursor=cursor, page_size=page_size)
+
+@frappe.whitelist(allow_guest=False, methods=['GET'])
+@require_permission("Performance Review", "read")
+def get_review_aging(workflow_state="Under Approval", older_than_days=14, company=None):
+    """Count reviews that have been in `workflow_state` for more than `older_than_days`, per department
+
+    Served from the (workflow_state, state_entered_at) index joined to CM Employee.
+    """
+    try:
+        params, error = get_aging_params(workflow_state, older_than_days, company)
+        if error:
+            return {"success": False, "error": error}
+        company_condition = "AND emp.company = %(company)s" if params["company"] else ""
+        
+        departments = frappe.db.sql(f"""
+            SELECT
+                emp.department,
+                COUNT(*) AS reviews,
+                MIN(pr.state_entered_at) AS oldest_entered_at
+            FROM `tabPerformance Review` pr
+            INNER JOIN `tabCM Employee` emp ON emp.name = pr.employee
+            WHERE pr.workflow_state = %(workflow_state)s
+                AND pr.state_entered_at < %(cutoff)s
+                {company_condition}
+            GROUP BY emp.department
+            ORDER BY reviews DESC
+        """, params, as_dict=True)
+        
+        current_time = now_datetime()
+        for department in departments:
+            department.max_days_in_state = (current_time - department.oldest_entered_at).days
+        
+        return {"success": True, "data": {
+            "workflow_state": workflow_state,
+            "older_than_days": params["older_than_days"],
+            "total_reviews": sum(department.reviews for department in departments),
+            "departments": departments
+        }}
+    except Exception as e:
+        frappe.log_error(f"Error fetching review aging for {workflow_state}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['GET'])
+@require_permission("Performance Review", "read")
+def get_aging_reviews(workflow_state="Under Approval", older_than_days=14, company=None, department=None,
+                      cursor=None, page_size=None):
+    """Get the reviews that have been in `workflow_state` for more than `older_than_days`, oldest first
+
+    Pages are keyset range scans on the (workflow_state, state_entered_at) index.
+    """
+    try:
+        params, error = get_aging_params(workflow_state, older_than_days, company)
+        if error:
+            return {"success": False, "error": error}
+        
+        page_size = get_page_size(page_size)
+        params.update({"department": department, "limit": page_size + 1})
+        conditions = []
+        if params["company"]:
+            conditions.append("AND emp.company = %(company)s")
+        if department:
+            conditions.append("AND emp.department = %(department)s")
+        if cursor:
+            params["after_entered_at"], params["after_name"] = decode_cursor(cursor)
+            conditions.append("""AND (pr.state_entered_at > %(after_entered_at)s
+                OR (pr.state_entered_at = %(after_entered_at)s AND pr.name > %(after_name)s))""")
+        
+        reviews = frappe.db.sql(f"""
+            SELECT
+                pr.name,
+                pr.employee,
+                emp.employee_name,
+                emp.department,
+                pr.reviewer,
+                pr.state_entered_at
+            FROM `tabPerformance Review` pr
+            INNER JOIN `tabCM Employee` emp ON emp.name = pr.employee
+            WHERE pr.workflow_state = %(workflow_state)s
+                AND pr.state_entered_at < %(cutoff)s
+                {" ".join(conditions)}
+            ORDER BY pr.state_entered_at ASC, pr.name ASC
+            LIMIT %(limit)s
+        """, params, as_dict=True)
+        
+        next_cursor = None
+        if len(reviews) > page_size:
+            reviews = reviews[:page_size]
+            next_cursor = encode_cursor(reviews[-1], "state_entered_at")
+        
+        current_time = now_datetime()
+        for review in reviews:
+            review.days_in_state = (current_time - review.state_entered_at).days
+        
+        return paginated_response(reviews, next_cursor)
+    except Exception as e:
+        frappe.log_error(f"Error fetching aging reviews for {workflow_state}: {str(e)}")
         return {"success": False, "error": str(e)}
 
+def get_aging_params(workflow_state, older_than_days, company):
+    """Validate an aging query and build its parameters; returns (params, error)"""
+    if workflow_state not in [state["state"] for state in WORKFLOW_STATES]:
+        return None, f"Invalid workflow state: {workflow_state}"
+    
+    company = company or get_scoped_company()
+    if company and not can_access_company_data(company):
+        return None, "You can only access data for your company"
+    
+    older_than_days = cint(older_than_days)
+    return {
+        "workflow_state": workflow_state,
+        "older_than_days": older_than_days,
+        "cutoff": add_days(now_datetime(), -older_than_days),
+        "company": company
+    }, None
+
 @frappe.whitelist(allow_guest=False, methods=['POST'])
 def workflow_action(name, action):
     """Execute workflow action on performance review"""
     try:
         review = frappe.get_doc('Performance Review', name)
         
-        # Validate workflow action based on current state and user role
-        user_roles = frappe.get_roles()
-        current_state = review.workflow_state
-        
-        # Define valid actions according to Employee Performance Review Cycle workflow
-        valid_actions = {
-            "Pending Review": {"Schedule Review": ["Department Manager", "Company Admin"]},
-            "Review Scheduled": {"Provide Feedback": ["Department Manager", "Company Admin"]},
-            "Feedback Provided": {"Submit for Approval": ["Department Manager"]},
-            "Under Approval": {
-                "Approve Review": ["Company Admin"],
-                "Reject Review": ["Company Admin"]
-            },
-            "Review Rejected": {"Update Feedback": ["Department Manager"]}
-        }
-        
-        if current_state in valid_actions and action in valid_actions[current_state]:
-            allowed_roles = valid_actions[current_state][action]
-            if any(role in user_roles for role in allowed_roles):
-                # Set flag to prevent automatic transitions during manual workflow actions
-                frappe.flags.in_workflow_action = True
-                
-                try:
-                    # Execute the workflow action according to Employee Performance Review Cycle
-                    if action == "Schedule Review":
-                        review.workflow_state = "Review Scheduled"
-                    elif action == "Provide Feedback":
-                        review.workflow_state = "Feedback Provided"
-                    elif action == "Submit for Approval":
-                        review.workflow_state = "Under Approval"
-                        review.submitted_for_approval = 1
-                    elif action == "Approve Review":
-                        review.workflow_state = "Review Approved"
-                        review.submit()
-                    elif action == "Reject Review":
-                        review.workflow_state = "Review Rejected"
-                    elif action == "Update Feedback":
-                        review.workflow_state = "Feedback Provided"
-                    
-                    review.save()
-                    return {"success": True, "data": review.as_dict()}
-                    
-                finally:
-                    # Clear the flag
-                    frappe.flags.in_workflow_action = False
-            else:
-                return {"success": False, "error": "Insufficient permissions for this action"}
-        else:
+        # Validate workflow action based on current state and user role using the
+        # compiled Employee Performance Review Cycle transition table
+        transition = get_transition(review.workflow_state, action)
+        if not transition:
             return {"success": False, "error": "Invalid action for current state"}
+        
+        if not transition.roles.intersection(frappe.get_roles()):
+            return {"success": False, "error": "Insufficient permissions for this action"}
+        
+        apply_transition(review, transition)
+        return {"success": True, "data": review.as_dict()}
             
     except Exception as e:
         frappe.log_error(f"Error executing workflow action {action} on {name}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['GET'])
+@require_permission("Performance Review", "read")
+def get_workflow_actions(name):
+    """Get the workflow actions the current user can perform on a performance review"""
+    try:
+        # Company scoping is added by the Performance Review permission query conditions
+        reviews = frappe.get_list('Performance Review', filters={'name': name}, fields=['workflow_state'])
+        if not reviews:
+            return {"success": False, "error": f"Performance Review {name} not found"}
+        
+        workflow_state = reviews[0].workflow_state
+        return {"success": True, "data": {
+            "workflow_state": workflow_state,
+            "actions": get_allowed_actions(workflow_state)
+        }}
+    except Exception as e:
+        frappe.log_error(f"Error fetching workflow actions for {name}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['POST'])
+def bulk_workflow_action(names, action):
+    """Execute one workflow action on many performance reviews
+
+    All transitions are validated against the current states in one query.
+    Valid ones are applied in batched transactions, or in a background job for
+    large sets; results are reported per document, for background jobs through
+    get_bulk_workflow_action_status.
+    """
+    try:
+        names = frappe.parse_json(names) or []
+        if isinstance(names, str):
+            names = [names]
+        names = list(dict.fromkeys(names))
+        
+        results, valid_names = validate_bulk_workflow_action(names, action)
+        
+        if len(valid_names) > BULK_ACTION_BACKGROUND_THRESHOLD:
+            # enqueue_after_commit returns no job, so the id is chosen here
+            job_id = f"bulk_workflow_action::{frappe.generate_hash(length=12)}"
+            for name in valid_names:
+                results[name] = {"success": True, "queued": True}
+            
+            # Registered before the enqueue so the job never finds its status missing
+            user = frappe.session.user
+            run_after_commit(lambda: set_bulk_action_status(job_id, user, "Queued", results))
+            frappe.enqueue(
+                "company_management.company_management.api.performance_review.run_bulk_workflow_action",
+                queue="long",
+                timeout=3600,
+                job_id=job_id,
+                names=valid_names,
+                action=action,
+                enqueue_after_commit=True,
+            )
+            return {"success": True, "data": results, "job_id": job_id}
+        
+        results.update(apply_bulk_workflow_action(valid_names, action))
+        return {"success": True, "data": results}
+    except Exception as e:
+        frappe.log_error(f"Error executing bulk workflow action {action}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['GET'])
+def get_bulk_workflow_action_status(job_id):
+    """Get the status and per-review results of a background bulk workflow action"""
+    try:
+        entry = frappe.cache().get_value(get_bulk_action_key(job_id), expires=True)
+        if not entry or (entry["user"] != frappe.session.user and frappe.session.user != "Administrator"):
+            return {"success": False, "error": f"Bulk workflow action {job_id} not found"}
+        
+        return {"success": True, "data": {"status": entry["status"], "results": entry["results"]}}
+    except Exception as e:
+        frappe.log_error(f"Error fetching bulk workflow action {job_id}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+def validate_bulk_workflow_action(names, action):
+    """Check `action` against the current state of every review with a single query
+
+    Returns (results for rejected reviews, names of reviews that can be transitioned).
+    """
+    results = {}
+    valid_names = []
+    user_roles = set(frappe.get_roles())
+    
+    # Company scoping is added by the Performance Review permission query conditions;
+    # reviews outside the user's company are reported as not found
+    current_states = dict(frappe.get_list('Performance Review',
+                                          filters={'name': ['in', names]},
+                                          fields=['name', 'workflow_state'],
+                                          as_list=True,
+                                          limit_page_length=0)) if names else {}
+    
+    for name in names:
+        if name not in current_states:
+            results[name] = {"success": False, "error": "Performance Review not found"}
+            continue
+        
+        transition = get_transition(current_states[name], action)
+        if not transition:
+            results[name] = {"success": False, "error": "Invalid action for current state"}
+        elif not transition.roles & user_roles:
+            results[name] = {"success": False, "error": "Insufficient permissions for this action"}
+        else:
+            valid_names.append(name)
+    
+    return results, valid_names
+
+def get_bulk_action_key(job_id):
+    return f"{BULK_ACTION_RESULTS_KEY_PREFIX}::{job_id}"
+
+def set_bulk_action_status(job_id, user, status, results):
+    frappe.cache().set_value(get_bulk_action_key(job_id),
+                             {"user": user, "status": status, "results": results},
+                             expires_in_sec=BULK_ACTION_RESULTS_TTL)
+
+def run_bulk_workflow_action(job_id, names, action):
+    """Background job: apply a bulk workflow action, publishing results after every batch"""
+    entry = frappe.cache().get_value(get_bulk_action_key(job_id), expires=True) or {"results": {}}
+    results = entry["results"]
+    user = frappe.session.user
+    
+    def publish(batch_results):
+        results.update(batch_results)
+        set_bulk_action_status(job_id, user, "Running", results)
+    
+    try:
+        apply_bulk_workflow_action(names, action, on_batch=publish)
+    except Exception as e:
+        for name in names:
+            if results.get(name, {}).get("queued"):
+                results[name] = {"success": False, "error": str(e)}
+        set_bulk_action_status(job_id, user, "Failed", results)
+        raise
+    
+    set_bulk_action_status(job_id, user, "Completed", results)
+
+def apply_bulk_workflow_action(names, action, on_batch=None):
+    """Apply a validated workflow action in batches, committing once per batch
+
+    `on_batch` is called with the results of each committed batch.
+    """
+    results = {}
+    user_roles = set(frappe.get_roles())
+    
+    for start in range(0, len(names), BULK_ACTION_BATCH_SIZE):
+        batch_results = {}
+        for name in names[start:start + BULK_ACTION_BATCH_SIZE]:
+            try:
+                # A failed review is rolled back together with its counter and notification callbacks
+                with savepoint("bulk_workflow_action"):
+                    review = frappe.get_doc('Performance Review', name)
+                    
+                    # The state may have moved since validation; re-check against the loaded document
+                    transition = get_transition(review.workflow_state, action)
+                    if not transition or not transition.roles & user_roles:
+                        batch_results[name] = {"success": False, "error": "Invalid action for current state"}
+                        continue
+                    
+                    apply_transition(review, transition)
+                    batch_results[name] = {"success": True, "workflow_state": review.workflow_state}
+            except Exception as e:
+                batch_results[name] = {"success": False, "error": str(e)}
+        
+        frappe.db.commit()
+        results.update(batch_results)
+        if on_batch:
+            on_batch(batch_results)
+    
+    return results
+
+@frappe.whitelist(allow_guest=False, methods=['POST'])
+@require_permission("Performance Review", "create")
+def launch_review_cycle(company, review_period_start, review_period_end, department=None):
+    """Create reviews for every Active employee of a company (or department) in a background job"""
+    try:
+        if not can_access_company_data(company):
+            return {"success": False, "error": "You can only access data for your company"}
+        
+        if getdate(review_period_end) < getdate(review_period_start):
+            return {"success": False, "error": "Review period end cannot be before review period start"}
+        
+        # Relaunching the same cycle while it is still running is deduplicated by job id;
+        # relaunching later is safe because existing reviews are skipped
+        job_id = f"review_cycle::{company}::{department or ''}::{review_period_start}::{review_period_end}"
+        frappe.enqueue(
+            "company_management.company_management.workflow.review_cycle.generate_review_cycle",
+            queue="long",
+            timeout=6 * 3600,
+            job_id=job_id,
+            deduplicate=True,
+            company=company,
+            department=department,
+            review_period_start=review_period_start,
+            review_period_end=review_period_end,
+        )
+        return {"success": True, "data": {"job_id": job_id}}
+    except Exception as e:
+        frappe.log_error(f"Error launching review cycle for {company}: {str(e)}")
         return {"success": False, "error": str(e)}
\ No newline at end of file
@@ -1,6 +1,12 @@
 import frappe
 from frappe import _
-from company_management.company_management.auth.security import require_permission, filter_by_user_company
+from frappe.utils import flt, now
+from company_management.company_management.auth.security import require_permission, filter_by_user_company, can_access_company_data
+from company_management.company_management.doctype.cm_project.cm_project import get_assignee_errors
+from company_management.company_management.utils.pagination import paginate, paginated_response
+
+MAX_TEAMS_BATCH_SIZE = 500
+MAX_ASSIGNMENT_BATCH_SIZE = 1000
 
 @frappe.whitelist(allow_guest=False, methods=['POST'])
 @require_permission("Project", "create")
@@ -18,16 +24,17 @@ def create_project():
 
 @frappe.whitelist(allow_guest=False, methods=['GET'])
 @require_permission("Project", "read")
-def get_projects():
-    """Get all projects"""
+def get_projects(cursor=None, page_size=None):
+    """Get projects, one page at a time"""
     try:
         filters = filter_by_user_company("Project")
-        projects = frappe.get_all('Project',
-                                filters=filters,
-                                fields=['name', 'project_name', 'company', 'department',
-                                       'project_manager', 'start_date', 'end_date', 'status',
-                                       'budget', 'priority'])
-        return {"success": True, "data": projects}
+        projects, next_cursor = paginate('Project',
+                                       filters=filters,
+                                       fields=['name', 'project_name', 'company', 'department',
+                                              'project_manager', 'start_date', 'end_date', 'status',
+                                              'budget', 'priority'],
+                                       cursor=cursor, page_size=page_size)
+        return paginated_response(projects, next_cursor)
     except Exception as e:
         frappe.log_error(f"Error fetching projects: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -70,15 +77,16 @@ def delete_project(name):
 
 @frappe.whitelist(allow_guest=False, methods=['GET'])
 @require_permission("Project", "read")
-def get_projects_by_department(department):
-    """Get projects by department"""
+def get_projects_by_department(department, cursor=None, page_size=None):
+    """Get projects by department, one page at a time"""
     try:
         filters = filter_by_user_company("Project", {"department": department})
-        projects = frappe.get_all('Project',
-                                filters=filters,
-                                fields=['name', 'project_name', 'project_manager',
-                                       'start_date', 'end_date', 'status', 'priority'])
-        return {"success": True, "data": projects}
+        projects, next_cursor = paginate('Project',
+                                       filters=filters,
+                                       fields=['name', 'project_name', 'project_manager',
+                                              'start_date', 'end_date', 'status', 'priority'],
+                                       cursor=cursor, page_size=page_size)
+        return paginated_response(projects, next_cursor)
     except Exception as e:
         frappe.log_error(f"Error fetching projects for department {department}: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -88,51 +96,245 @@ def get_projects_by_department(department):
 def get_project_team(name):
     """Get project team members"""
     try:
-        project = frappe.get_doc('Project', name)
-        team_members = []
-        
-        if project.assigned_employees:
-            for emp in project.assigned_employees:
-                employee_data = frappe.get_value('Employee', emp.employee,
-                                               ['employee_name', 'email_address', 'designation'],
-                                               as_dict=True)
-                if employee_data:
-                    team_members.append({
-                        "employee": emp.employee,
-                        "employee_name": employee_data.employee_name,
-                        "email_address": employee_data.email_address,
-                        "designation": employee_data.designation,
-                        "role": emp.role,
-                        "allocated_hours": emp.allocated_hours,
-                        "hourly_rate": emp.hourly_rate
-                    })
+        if not frappe.db.exists('CM Project', name):
+            return {"success": False, "error": f"Project {name} not found"}
         
+        team_members = get_team_members([name]).get(name, [])
         return {"success": True, "data": team_members}
     except Exception as e:
         frappe.log_error(f"Error fetching team for project {name}: {str(e)}")
         return {"success": False, "error": str(e)}
 
+@frappe.whitelist(allow_guest=False)
+@require_permission("Project", "read")
+def get_project_teams(projects):
+    """Get team members of many projects in one call, keyed by project"""
+    try:
+        projects = frappe.parse_json(projects)
+        if isinstance(projects, str):
+            projects = [projects]
+        
+        projects = list(dict.fromkeys(projects))
+        if len(projects) > MAX_TEAMS_BATCH_SIZE:
+            return {"success": False, "error": f"At most {MAX_TEAMS_BATCH_SIZE} projects can be requested at once"}
+        
+        # Company scoping is added by the CM Project permission query conditions
+        visible = frappe.get_list('CM Project', filters={'name': ['in', projects]},
+                                  pluck='name', limit_page_length=0)
+        teams = get_team_members(visible)
+        return {"success": True, "data": {project: teams.get(project, []) for project in visible}}
+    except Exception as e:
+        frappe.log_error(f"Error fetching project teams: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+def get_team_members(projects):
+    """Team members of `projects` with their employee details, from one joined query"""
+    if not projects:
+        return {}
+    
+    rows = frappe.db.sql("""
+        SELECT
+            assignment.parent AS project,
+            assignment.employee,
+            emp.employee_name,
+            emp.email_address,
+            emp.designation,
+            assignment.role,
+            assignment.allocated_hours,
+            assignment.hourly_rate
+        FROM `tabCM Project Employee` assignment
+        INNER JOIN `tabCM Employee` emp ON emp.name = assignment.employee
+        WHERE assignment.parenttype = 'CM Project'
+            AND assignment.parentfield = 'assigned_employees'
+            AND assignment.parent IN %(projects)s
+        ORDER BY assignment.parent, assignment.idx
+    """, {"projects": projects}, as_dict=True)
+    
+    teams = {}
+    for row in rows:
+        teams.setdefault(row.pop("project"), []).append(row)
+    return teams
+
 @frappe.whitelist(allow_guest=False, methods=['POST'])
 @require_permission("Project", "write")
 def assign_employee_to_project(project_name, employee, role=None, allocated_hours=None, hourly_rate=None):
-    """Assign employee to project"""
+    """Assign employee to project by inserting a single team row
+
+    The project is not re-saved; it is only read back to keep the response shape.
+    """
     try:
-        project = frappe.get_doc('Project', project_name)
-        
-        # Check if employee already assigned
-        existing = [emp for emp in project.assigned_employees if emp.employee == employee]
-        if existing:
-            return {"success": False, "error": "Employee already assigned to this project"}
-        
-        project.append('assigned_employees', {
+        result = add_project_assignments(project_name, [{
             'employee': employee,
             'role': role,
             'allocated_hours': allocated_hours,
             'hourly_rate': hourly_rate
-        })
-        
-        project.save()
-        return {"success": True, "data": project.as_dict()}
+        }])
+        if result["already_assigned"]:
+            return {"success": False, "error": "Employee already assigned to this project"}
+        return {"success": True, "data": frappe.get_doc('CM Project', project_name).as_dict()}
     except Exception as e:
+        if frappe.db.is_unique_key_violation(e):
+            return {"success": False, "error": "Employee already assigned to this project"}
         frappe.log_error(f"Error assigning employee to project: {str(e)}")
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['POST'])
+@require_permission("Project", "write")
+def unassign_employee_from_project(project_name, employee):
+    """Remove employee from project by deleting their team row"""
+    try:
+        result = remove_project_assignments(project_name, [employee])
+        if not result["unassigned"]:
+            return {"success": False, "error": "Employee is not assigned to this project"}
+        return {"success": True, "message": "Employee unassigned successfully"}
+    except Exception as e:
+        frappe.log_error(f"Error unassigning employee from project: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['POST'])
+@require_permission("Project", "write")
+def bulk_assign_employees_to_project(project_name, employees):
+    """Assign many employees to a project; employees already on the team are skipped
+
+    `employees` is a list of employee names or of {employee, role, allocated_hours, hourly_rate}.
+    """
+    try:
+        assignments = parse_assignments(employees)
+        if len(assignments) > MAX_ASSIGNMENT_BATCH_SIZE:
+            return {"success": False, "error": f"At most {MAX_ASSIGNMENT_BATCH_SIZE} employees can be assigned at once"}
+        
+        return {"success": True, "data": add_project_assignments(project_name, assignments)}
+    except Exception as e:
+        frappe.log_error(f"Error assigning employees to project {project_name}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@frappe.whitelist(allow_guest=False, methods=['POST'])
+@require_permission("Project", "write")
+def bulk_unassign_employees_from_project(project_name, employees):
+    """Remove many employees from a project"""
+    try:
+        employees = [assignment['employee'] for assignment in parse_assignments(employees)]
+        if len(employees) > MAX_ASSIGNMENT_BATCH_SIZE:
+            return {"success": False, "error": f"At most {MAX_ASSIGNMENT_BATCH_SIZE} employees can be unassigned at once"}
+        
+        return {"success": True, "data": remove_project_assignments(project_name, employees)}
+    except Exception as e:
+        frappe.log_error(f"Error unassigning employees from project {project_name}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+def parse_assignments(employees):
+    """Normalise `employees` (one name, one assignment dict, or a list of either) to assignment dicts"""
+    employees = frappe.parse_json(employees) or []
+    if isinstance(employees, (str, dict)):
+        employees = [employees]
+    if not isinstance(employees, list):
+        frappe.throw("Employees must be a list of employee names or assignments")
+    
+    assignments = []
+    for entry in employees:
+        assignment = {'employee': entry} if isinstance(entry, str) else entry
+        if not isinstance(assignment, dict) or not assignment.get('employee') \
+                or not isinstance(assignment['employee'], str):
+            frappe.throw(f"Invalid employee entry: {frappe.as_json(entry, indent=None)}")
+        assignments.append(assignment)
+    return assignments
+
+def lock_project_for_assignment(project_name):
+    """Lock the project row so concurrent assigners are serialized, and check company access"""
+    project = frappe.db.get_value('CM Project', project_name, ['name', 'company'], as_dict=True, for_update=True)
+    if not project:
+        frappe.throw(f"Project {project_name} not found", frappe.DoesNotExistError)
+    if not can_access_company_data(project.company):
+        frappe.throw("You can only access data for your company", frappe.PermissionError)
+    return project
+
+def get_assigned_employees(project_name, employees):
+    """Which of `employees` already have a team row on the project"""
+    return set(frappe.get_all('CM Project Employee',
+                              filters={
+                                  'parent': project_name,
+                                  'parenttype': 'CM Project',
+                                  'employee': ['in', list(employees)]
+                              },
+                              pluck='employee'))
+
+def add_project_assignments(project_name, assignments):
+    """Insert team rows for `assignments` without loading or re-saving the project
+
+    Rows are appended after the current last row with one multi-row insert; the
+    unique (parent, employee) constraint rejects duplicates from concurrent saves.
+    """
+    project = lock_project_for_assignment(project_name)
+    assignments = list({assignment['employee']: assignment for assignment in assignments
+                        if assignment.get('employee')}.values())
+    if not assignments:
+        return {"assigned": [], "already_assigned": []}
+    
+    employees = [assignment['employee'] for assignment in assignments]
+    errors = get_assignee_errors(project.company, employees)
+    if errors:
+        frappe.throw("<br>".join(errors))
+    
+    already_assigned = get_assigned_employees(project.name, employees)
+    last_idx = frappe.db.sql("""
+        SELECT IFNULL(MAX(idx), 0) FROM `tabCM Project Employee`
+        WHERE parent = %s AND parenttype = 'CM Project'
+    """, (project.name,))[0][0]
+    
+    timestamp = now()
+    user = frappe.session.user
+    assigned = []
+    for assignment in assignments:
+        if assignment['employee'] in already_assigned:
+            continue
+        last_idx += 1
+        assigned.append(frappe._dict(
+            name=frappe.generate_hash(length=10),
+            parent=project.name,
+            parenttype='CM Project',
+            parentfield='assigned_employees',
+            idx=last_idx,
+            employee=assignment['employee'],
+            role=assignment.get('role'),
+            allocated_hours=flt(assignment.get('allocated_hours')),
+            hourly_rate=flt(assignment.get('hourly_rate'))
+        ))
+    
+    if assigned:
+        fields = ["name", "owner", "modified_by", "creation", "modified", "docstatus", "parent", "parenttype",
+                  "parentfield", "idx", "employee", "role", "allocated_hours", "hourly_rate"]
+        frappe.db.bulk_insert('CM Project Employee', fields=fields, values=[
+            (row.name, user, user, timestamp, timestamp, 0, row.parent, row.parenttype, row.parentfield,
+             row.idx, row.employee, row.role, row.allocated_hours, row.hourly_rate)
+            for row in assigned
+        ])
+        touch_project(project.name, timestamp)
+    
+    return {"assigned": assigned, "already_assigned": sorted(already_assigned)}
+
+def remove_project_assignments(project_name, employees):
+    """Delete the team rows of `employees` without loading or re-saving the project"""
+    project = lock_project_for_assignment(project_name)
+    employees = list(dict.fromkeys(filter(None, employees)))
+    if not employees:
+        return {"unassigned": [], "not_assigned": []}
+    
+    assigned = get_assigned_employees(project.name, employees)
+    if assigned:
+        frappe.db.delete('CM Project Employee', {
+            'parent': project.name,
+            'parenttype': 'CM Project',
+            'employee': ['in', list(assigned)]
+        })
+        touch_project(project.name, now())
+    
+    return {
+        "unassigned": [employee for employee in employees if employee in assigned],
+        "not_assigned": [employee for employee in employees if employee not in assigned]
+    }
+
+def touch_project(project_name, timestamp):
+    """Bump the project's modified timestamp after a direct team change"""
+    frappe.db.set_value('CM Project', project_name,
+                        {'modified': timestamp, 'modified_by': frappe.session.user},
+                        update_modified=False)
\ No newline at end of file
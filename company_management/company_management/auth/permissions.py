@@ -0,0 +1,62 @@
+import frappe
+from company_management.company_management.auth.user_context import get_user_context
+
+def get_scoped_company(user=None):
+    """Company the user is restricted to, or None when no company scoping applies"""
+    user = user or frappe.session.user
+    if user == "Administrator":
+        return None
+
+    user_context = get_user_context(user)
+    if user_context.is_company_admin:
+        return None
+    return user_context.company
+
+def company_condition(doctype, user=None):
+    """SQL predicate restricting `doctype` rows to the user's company"""
+    company = get_scoped_company(user)
+    if not company:
+        return ""
+    return f"`tab{doctype}`.`company` = {frappe.db.escape(company)}"
+
+# permission_query_conditions hooks
+
+def get_company_conditions(user=None):
+    company = get_scoped_company(user)
+    if not company:
+        return ""
+    return f"`tabCM Company`.`name` = {frappe.db.escape(company)}"
+
+def get_department_conditions(user=None):
+    return company_condition("CM Department", user)
+
+def get_employee_conditions(user=None):
+    return company_condition("CM Employee", user)
+
+def get_project_conditions(user=None):
+    return company_condition("CM Project", user)
+
+def get_performance_review_conditions(user=None):
+    """Scope reviews through their employee with a subquery on the indexed CM Employee.company"""
+    company = get_scoped_company(user)
+    if not company:
+        return ""
+    return f"""`tabPerformance Review`.`employee` in (
+        select `tabCM Employee`.`name` from `tabCM Employee`
+        where `tabCM Employee`.`company` = {frappe.db.escape(company)})"""
+
+# has_permission hooks
+
+def has_company_permission(doc, ptype=None, user=None):
+    company = get_scoped_company(user)
+    return not company or doc.name == company
+
+def has_company_scoped_permission(doc, ptype=None, user=None):
+    company = get_scoped_company(user)
+    return not company or not doc.get("company") or doc.company == company
+
+def has_performance_review_permission(doc, ptype=None, user=None):
+    company = get_scoped_company(user)
+    if not company or not doc.get("employee"):
+        return True
+    return frappe.db.get_value("CM Employee", doc.employee, "company") == company
@@ -1,19 +1,81 @@
 import frappe
 from frappe.auth import LoginManager
+from company_management.company_management.auth.user_context import get_user_context
+from company_management.company_management.utils.cache import local_cache
+
+PERMISSION_MATRIX_CACHE_KEY = "cm_permission_matrix"
+
+# One bit per DocPerm operation in the compiled (doctype, role) -> bits matrix
+PERMISSION_BITS = {
+    operation: 1 << index
+    for index, operation in enumerate((
+        "read", "write", "create", "delete", "submit", "cancel", "amend",
+        "report", "export", "import", "share", "print", "email",
+    ))
+}
+
+# The matrix is cached under the site's metadata version, which frappe regenerates
+# on every doctype cache clear, including Role Permission Manager changes that write
+# DocPerm rows directly without doc events. The TTL bounds staleness for any other path.
+PERMISSION_MATRIX_TTL = 300
+
+def build_permission_matrix():
+    """Compile Custom DocPerm rows into a {(doctype, role): permission bits} matrix"""
+    rows = frappe.get_all("Custom DocPerm",
+                          filters={"permlevel": 0},
+                          fields=["parent", "role", *PERMISSION_BITS])
+    matrix = {}
+    for row in rows:
+        bits = 0
+        for operation, bit in PERMISSION_BITS.items():
+            if row.get(operation):
+                bits |= bit
+        key = (row.parent, row.role)
+        matrix[key] = matrix.get(key, 0) | bits
+    return matrix
+
+def get_permission_matrix():
+    """Get the compiled permission matrix from the worker cache, Redis, or the database"""
+    # Read once per request; frappe keeps it in the request-local cache
+    version = frappe.cache().get_value("metadata_version") or ""
+    local_key = ("permission_matrix", version)
+    matrix = local_cache.get(local_key)
+    if matrix is not None:
+        return matrix
+    
+    cache_key = f"{PERMISSION_MATRIX_CACHE_KEY}::{version}"
+    matrix = frappe.cache().get_value(cache_key, expires=True)
+    if matrix is None:
+        matrix = build_permission_matrix()
+        frappe.cache().set_value(cache_key, matrix, expires_in_sec=PERMISSION_MATRIX_TTL)
+    
+    local_cache.set(local_key, matrix, scopes=[("permissions", None)])
+    return matrix
+
+def clear_permission_matrix(doc=None, method=None):
+    """Invalidate the compiled permission matrix (DocPerm / Custom DocPerm hook and clear_cache hook)
+
+    Doc events clear it again after commit, so a request racing the transaction
+    cannot re-cache the old permissions.
+    """
+    local_cache.invalidate("permissions")
+    frappe.cache().delete_keys(PERMISSION_MATRIX_CACHE_KEY)
+    if doc is not None:
+        frappe.db.after_commit.add(clear_permission_matrix)
 
 def check_role_permission(role, doctype, operation):
     """Check if role has permission for operation on doctype"""
-    permissions = frappe.get_all("Custom DocPerm", 
-                               filters={"parent": doctype, "role": role},
-                               fields=[operation])
-    return bool(permissions and permissions[0].get(operation))
+    bit = PERMISSION_BITS.get(operation, 0)
+    return bool(get_permission_matrix().get((doctype, role), 0) & bit)
 
 def validate_api_access(doctype, operation):
     """Validate API access based on user role"""
     user_roles = frappe.get_roles(frappe.session.user)
+    matrix = get_permission_matrix()
+    bit = PERMISSION_BITS.get(operation, 0)
     
     for role in user_roles:
-        if check_role_permission(role, doctype, operation):
+        if matrix.get((doctype, role), 0) & bit:
             return True
     
     frappe.throw("Insufficient permissions", frappe.PermissionError)
@@ -29,28 +91,24 @@ def require_permission(doctype, operation):
 
 def get_user_company():
     """Get company associated with current user"""
-    user_account = frappe.get_value("User Account", 
-                                   {"email_address": frappe.session.user}, 
-                                   "company")
-    return user_account
+    return get_user_context().company
 
 def can_access_company_data(company):
     """Check if user can access data for specific company"""
-    if "Company Admin" in frappe.get_roles():
+    user_context = get_user_context()
+    if user_context.is_company_admin:
         return True
     
-    user_company = get_user_company()
-    return user_company == company
+    return user_context.company == company
 
 def filter_by_user_company(doctype, filters=None):
     """Add company filter based on user permissions"""
     if filters is None:
         filters = {}
     
-    if "Company Admin" not in frappe.get_roles():
-        user_company = get_user_company()
-        if user_company:
-            filters["company"] = user_company
+    user_context = get_user_context()
+    if not user_context.is_company_admin and user_context.company:
+        filters["company"] = user_context.company
     
     return filters
 
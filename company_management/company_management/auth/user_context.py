@@ -0,0 +1,66 @@
+import frappe
+
+USER_CONTEXT_CACHE_KEY = "cm_user_context"
+# Entries are also dropped by doc events; the TTL bounds staleness from any other path
+USER_CONTEXT_TTL = 300
+
+class UserContext:
+    """Company, roles and linked CM Employee of a user, resolved once per request"""
+
+    def __init__(self, user, company=None, employee=None, roles=None):
+        self.user = user
+        self.company = company
+        self.employee = employee
+        self.roles = roles or []
+
+    @property
+    def is_company_admin(self):
+        return "Company Admin" in self.roles
+
+def get_user_context(user=None):
+    """Get the context of `user` (default: session user), memoized on the request"""
+    user = user or frappe.session.user
+    contexts = getattr(frappe.local, "cm_user_contexts", None)
+    if contexts is None:
+        contexts = frappe.local.cm_user_contexts = {}
+
+    if user not in contexts:
+        contexts[user] = load_user_context(user)
+    return contexts[user]
+
+def load_user_context(user):
+    """Build a user context from the shared cache, falling back to the database"""
+    cache_key = get_user_context_key(user)
+    data = frappe.cache().get_value(cache_key, expires=True)
+    if data is None:
+        data = {
+            "company": frappe.get_value("User Account", {"email_address": user}, "company"),
+            "employee": frappe.get_value("CM Employee", {"email_address": user}, "name"),
+        }
+        frappe.cache().set_value(cache_key, data, expires_in_sec=USER_CONTEXT_TTL)
+
+    return UserContext(user, data["company"], data["employee"], frappe.get_roles(user))
+
+def get_user_context_key(user):
+    return f"{USER_CONTEXT_CACHE_KEY}::{user}"
+
+def clear_user_context(doc, method=None):
+    """Drop cached contexts for the emails on a User Account or CM Employee (doc event)
+
+    Entries are dropped now and again after commit, so a request racing the
+    transaction cannot re-cache the old company or employee.
+    """
+    users = {doc.get("email_address")}
+    doc_before_save = doc.get_doc_before_save()
+    if doc_before_save:
+        users.add(doc_before_save.get("email_address"))
+    users = [user for user in users if user]
+
+    drop_user_contexts(users)
+    frappe.db.after_commit.add(lambda: drop_user_contexts(users))
+
+def drop_user_contexts(users):
+    contexts = getattr(frappe.local, "cm_user_contexts", None) or {}
+    for user in users:
+        frappe.cache().delete_value(get_user_context_key(user))
+        contexts.pop(user, None)
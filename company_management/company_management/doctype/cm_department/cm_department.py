@@ -1,5 +1,9 @@
 import frappe
 from frappe.model.document import Document
+from company_management.company_management.utils.counters import update_parent_counters
+
+# Parent links whose number_of_departments counter follows this department
+COUNTER_PARENTS = {"company": "CM Company"}
 
 class CMDepartment(Document):
     def before_save(self):
@@ -14,9 +18,12 @@ class CMDepartment(Document):
         self.number_of_projects = frappe.db.count('CM Project', 
                                                 filters={'department': self.name})
     
+    def after_insert(self):
+        update_parent_counters(self, "number_of_departments", COUNTER_PARENTS, delta=1)
+    
     def on_update(self):
-        # Update company counts when department changes
-        if self.company:
-            company_doc = frappe.get_doc('CM Company', self.company)
-            company_doc.calculate_counts()
-            company_doc.save()
\ No newline at end of file
+        # Move the count when the department changes company
+        update_parent_counters(self, "number_of_departments", COUNTER_PARENTS)
+    
+    def on_trash(self):
+        update_parent_counters(self, "number_of_departments", COUNTER_PARENTS, delta=-1)
@@ -1,6 +1,10 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import date_diff, getdate
+from company_management.company_management.utils.counters import update_parent_counters
+
+# Parent links whose number_of_employees counter follows this employee
+COUNTER_PARENTS = {"department": "CM Department", "company": "CM Company"}
 
 class CMEmployee(Document):
     def before_save(self):
@@ -10,9 +14,12 @@ class CMEmployee(Document):
         if self.hired_on:
             self.days_employed = date_diff(getdate(), self.hired_on)
     
+    def after_insert(self):
+        update_parent_counters(self, "number_of_employees", COUNTER_PARENTS, delta=1)
+    
     def on_update(self):
-        # Update department and company counts
-        if self.department:
-            dept_doc = frappe.get_doc('CM Department', self.department)
-            dept_doc.calculate_counts()
-            dept_doc.save()
\ No newline at end of file
+        # Move the count when the employee changes department or company
+        update_parent_counters(self, "number_of_employees", COUNTER_PARENTS)
+    
+    def on_trash(self):
+        update_parent_counters(self, "number_of_employees", COUNTER_PARENTS, delta=-1)
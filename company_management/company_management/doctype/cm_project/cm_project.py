@@ -1,20 +1,61 @@
+from collections import Counter
+
 import frappe
 from frappe.model.document import Document
+from company_management.company_management.utils.counters import update_parent_counters
+
+# Parent links whose number_of_projects counter follows this project
+COUNTER_PARENTS = {"department": "CM Department", "company": "CM Company"}
 
 class CMProject(Document):
     def validate(self):
         self.validate_dates()
         self.validate_employees()
     
+    def after_insert(self):
+        update_parent_counters(self, "number_of_projects", COUNTER_PARENTS, delta=1)
+    
+    def on_update(self):
+        # Move the count when the project changes department or company
+        update_parent_counters(self, "number_of_projects", COUNTER_PARENTS)
+    
+    def on_trash(self):
+        update_parent_counters(self, "number_of_projects", COUNTER_PARENTS, delta=-1)
+    
     def validate_dates(self):
         if self.end_date and self.start_date:
             if self.end_date < self.start_date:
                 frappe.throw("End date cannot be before start date")
     
     def validate_employees(self):
-        # Validate that assigned employees belong to the same company
-        if self.assigned_employees:
-            for emp in self.assigned_employees:
-                employee = frappe.get_doc('CM Employee', emp.employee)
-                if employee.company != self.company:
-                    frappe.throw(f"Employee {emp.employee} does not belong to company {self.company}")
\ No newline at end of file
+        # Validate that assigned employees belong to the same company, resolving all of them in one query
+        employee_names = [emp.employee for emp in self.assigned_employees if emp.employee]
+        if not employee_names:
+            return
+        
+        errors = get_assignee_errors(self.company, employee_names)
+        
+        # Team rows are unique per (project, employee)
+        duplicates = sorted(name for name, count in Counter(employee_names).items() if count > 1)
+        if duplicates:
+            errors.append(f"Employees assigned more than once: {', '.join(duplicates)}")
+        if errors:
+            frappe.throw("<br>".join(errors))
+
+def get_assignee_errors(company, employee_names):
+    """Errors for assignees that do not exist or belong to another company, checked with one query"""
+    employee_names = set(employee_names)
+    companies = dict(frappe.get_all('CM Employee',
+                                    filters={'name': ['in', list(employee_names)]},
+                                    fields=['name', 'company'],
+                                    as_list=True))
+    
+    missing = sorted(employee_names - set(companies))
+    other_company = sorted(name for name, employee_company in companies.items() if employee_company != company)
+    
+    errors = []
+    if missing:
+        errors.append(f"Employees not found: {', '.join(missing)}")
+    if other_company:
+        errors.append(f"Employees {', '.join(other_company)} do not belong to company {company}")
+    return errors
\ No newline at end of file
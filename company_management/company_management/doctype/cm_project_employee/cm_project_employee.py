@@ -2,4 +2,8 @@ import frappe
 from frappe.model.document import Document
 
 class CMProjectEmployee(Document):
-    pass
\ No newline at end of file
+    pass
+
+def on_doctype_update():
+    # An employee appears at most once in a project team; assignment APIs rely on this
+    frappe.db.add_unique("CM Project Employee", ["parent", "employee"], constraint_name="unique_project_employee")
\ No newline at end of file
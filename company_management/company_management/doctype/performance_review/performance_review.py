@@ -1,60 +1,112 @@
+import json
+
 import frappe
 from frappe.model.document import Document
+from frappe.utils import cint, now
+from company_management.company_management.workflow.engine import get_transition
+
+# Entries kept in transition_history; older ones are dropped first
+MAX_TRANSITION_HISTORY = 50
 
 class PerformanceReview(Document):
     def validate(self):
+        self.set_rating()
         self.check_automatic_transitions()
+        self.set_submitted_for_approval()
+        self.track_state_change()
     
-    def on_update(self):
-        self.check_automatic_transitions()
-    
-    def on_update_after_submit(self):
-        self.check_automatic_transitions()
+    def set_rating(self):
+        """Derive the numeric rating from the leading digit of overall_rating ("4 - Good" -> 4)"""
+        if self.overall_rating and self.overall_rating[0] in "12345":
+            self.rating = cint(self.overall_rating[0])
+        else:
+            self.rating = 0
     
     def check_automatic_transitions(self):
-        """Check and execute automatic workflow transitions based on field changes"""
+        """Check and execute automatic workflow transitions based on field changes
+
+        Runs once per save from validate, before the document is written, so the
+        new state is persisted by the same save. Changes are detected against the
+        in-memory snapshot taken by frappe before save, without extra queries.
+        """
         # Skip automatic transitions if this is a workflow action
         if frappe.flags.in_workflow_action:
             return
             
-        old_state = self.get_db_value('workflow_state') or self.workflow_state
+        doc_before_save = self.get_doc_before_save()
+        old_state = (doc_before_save and doc_before_save.workflow_state) or self.workflow_state
         new_state = self.determine_new_workflow_state()
         
         if new_state and new_state != old_state:
             self.workflow_state = new_state
             frappe.msgprint(f"Workflow automatically transitioned to: {new_state}")
     
+    def set_submitted_for_approval(self):
+        """Flag reviews entering Under Approval, whether moved by a workflow action or automatically"""
+        doc_before_save = self.get_doc_before_save()
+        if self.workflow_state == "Under Approval" and (
+                not doc_before_save or doc_before_save.workflow_state != "Under Approval"):
+            self.submitted_for_approval = 1
+    
+    def track_state_change(self):
+        """Stamp state_entered_at and append to transition_history when the workflow state changes
+
+        Runs after automatic transitions so both manual and automatic changes are recorded.
+        """
+        doc_before_save = self.get_doc_before_save()
+        if doc_before_save and doc_before_save.workflow_state == self.workflow_state and self.state_entered_at:
+            return
+        
+        entered_at = now()
+        history = json.loads(self.transition_history) if self.transition_history else []
+        history.append([self.workflow_state, entered_at, frappe.session.user])
+        
+        self.state_entered_at = entered_at
+        self.transition_history = json.dumps(history[-MAX_TRANSITION_HISTORY:])
+    
     def determine_new_workflow_state(self):
         """Determine the new workflow state based on current field values"""
         current_state = self.workflow_state
+        action = None
         
         # Pending Review → Review Scheduled: When review_date is set
         if current_state == "Pending Review" and self.review_date:
-            return "Review Scheduled"
+            action = "Schedule Review"
         
         # Review Scheduled → Feedback Provided: When feedback is recorded
         elif current_state == "Review Scheduled" and self.feedback:
-            return "Feedback Provided"
+            action = "Provide Feedback"
         
         # Feedback Provided → Under Approval: When submitted_for_approval is checked
         elif current_state == "Feedback Provided" and self.submitted_for_approval:
-            return "Under Approval"
+            action = "Submit for Approval"
         
         # Note: Under Approval → Review Approved/Rejected transitions are handled by manager actions
         # Review Rejected → Feedback Provided: When feedback is updated after rejection
         elif current_state == "Review Rejected" and self.feedback_updated_after_rejection():
-            return "Feedback Provided"
+            action = "Update Feedback"
         
-        return None
+        # Target states come from the compiled workflow transition table
+        transition = get_transition(current_state, action) if action else None
+        return transition.next_state if transition else None
     
     def feedback_updated_after_rejection(self):
         """Check if feedback was updated after rejection"""
         if self.workflow_state == "Review Rejected":
-            # Check if any feedback fields have been changed using frappe's change detection
-            feedback_fields = ['feedback', 'goals_achievements', 'areas_for_improvement', 'development_plan']
+            # Compare feedback fields against the snapshot taken before save
+            doc_before_save = self.get_doc_before_save()
+            if not doc_before_save:
+                return True
             
-            for field in feedback_fields:
-                if self.has_value_changed(field):
-                    return True
+            feedback_fields = ['feedback', 'goals_achievements', 'areas_for_improvement', 'development_plan']
+            return any(self.get(field) != doc_before_save.get(field) for field in feedback_fields)
             
-        return False
\ No newline at end of file
+        return False
+
+def on_doctype_update():
+    # Rating analytics (per employee and review period) are served from this index
+    frappe.db.add_index("Performance Review", ["employee", "review_period_end", "rating"])
+    # Aging / SLA queries ("in Under Approval for more than N days") are served from this index
+    frappe.db.add_index("Performance Review", ["workflow_state", "state_entered_at"])
+    # Reviewer inboxes and their counter rebuilds filter on reviewer and state
+    frappe.db.add_index("Performance Review", ["reviewer", "workflow_state"])
\ No newline at end of file
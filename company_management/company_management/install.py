@@ -26,6 +26,13 @@ def after_install():
         except Exception as workflow_error:
             print(f"Warning: Could not create workflow: {str(workflow_error)}")
         
+        # Replace per-transition workflow emails with digests
+        print("Disabling per-transition workflow notifications...")
+        try:
+            setup_workflow_notifications()
+        except Exception as notification_error:
+            print(f"Warning: Could not update workflow notifications: {str(notification_error)}")
+        
         # Create default data
         print("Creating default data...")
         try:
@@ -0,0 +1,30 @@
+import frappe
+
+CHUNK_SIZE = 5000
+
+def execute():
+    """Populate Performance Review.rating from overall_rating for existing rows, in chunks"""
+    last_name = ""
+    
+    while True:
+        names = frappe.db.sql_list("""
+            SELECT name FROM `tabPerformance Review`
+            WHERE name > %s
+            ORDER BY name
+            LIMIT %s
+        """, (last_name, CHUNK_SIZE))
+        
+        if not names:
+            break
+        
+        frappe.db.sql("""
+            UPDATE `tabPerformance Review`
+            SET rating = CASE
+                WHEN overall_rating REGEXP '^[1-5]' THEN CAST(LEFT(overall_rating, 1) AS UNSIGNED)
+                ELSE 0
+            END
+            WHERE name IN %(names)s
+        """, {"names": names})
+        frappe.db.commit()
+        
+        last_name = names[-1]
@@ -0,0 +1,28 @@
+import frappe
+
+CHUNK_SIZE = 5000
+
+def execute():
+    """Seed state_entered_at and transition_history of existing reviews from their last modification, in chunks"""
+    last_name = ""
+    
+    while True:
+        names = frappe.db.sql_list("""
+            SELECT name FROM `tabPerformance Review`
+            WHERE name > %s
+            ORDER BY name
+            LIMIT %s
+        """, (last_name, CHUNK_SIZE))
+        
+        if not names:
+            break
+        
+        frappe.db.sql("""
+            UPDATE `tabPerformance Review`
+            SET state_entered_at = modified,
+                transition_history = JSON_ARRAY(JSON_ARRAY(workflow_state, CAST(modified AS CHAR), modified_by))
+            WHERE name IN %(names)s AND state_entered_at IS NULL
+        """, {"names": names})
+        frappe.db.commit()
+        
+        last_name = names[-1]
\ No newline at end of file
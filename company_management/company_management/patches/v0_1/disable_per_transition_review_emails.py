@@ -0,0 +1,15 @@
+import frappe
+from company_management.company_management.workflow.performance_review_workflow import (
+    WORKFLOW_NAME,
+    setup_workflow_notifications,
+)
+
+def execute():
+    """Turn off per-transition review emails on existing sites; digests replace them"""
+    if frappe.db.exists("Workflow", WORKFLOW_NAME):
+        # Saved through the document so frappe's cached workflow is refreshed
+        workflow = frappe.get_doc("Workflow", WORKFLOW_NAME)
+        workflow.send_email_alert = 0
+        workflow.save()
+    
+    setup_workflow_notifications()
\ No newline at end of file
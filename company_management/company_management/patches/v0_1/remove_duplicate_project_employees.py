@@ -0,0 +1,16 @@
+import frappe
+
+def execute():
+    """Remove duplicate project team rows so the unique (parent, employee) constraint can be added"""
+    if not frappe.db.table_exists("CM Project Employee"):
+        return
+    
+    # Keep the first row (lowest idx) of each employee in each project
+    frappe.db.sql("""
+        DELETE duplicate FROM `tabCM Project Employee` duplicate
+        INNER JOIN `tabCM Project Employee` kept
+            ON kept.parent = duplicate.parent
+            AND kept.employee = duplicate.employee
+            AND (kept.idx < duplicate.idx OR (kept.idx = duplicate.idx AND kept.name < duplicate.name))
+    """)
+    frappe.db.commit()
\ No newline at end of file
@@ -0,0 +1,14 @@
+import frappe
+from company_management.company_management.workflow.performance_review_workflow import (
+    WORKFLOW_NAME,
+    set_workflow_transitions,
+)
+
+def execute():
+    """Rewrite the transitions of an existing review workflow to one row per allowed role"""
+    if not frappe.db.exists("Workflow", WORKFLOW_NAME):
+        return
+    
+    workflow = frappe.get_doc("Workflow", WORKFLOW_NAME)
+    set_workflow_transitions(workflow)
+    workflow.save()
\ No newline at end of file
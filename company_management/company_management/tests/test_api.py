@@ -2,6 +2,8 @@ import frappe
 import unittest
 import json
 from company_management.company_management.api import company, employee, department, project
+from company_management.company_management.auth.security import check_role_permission
+from company_management.company_management.utils.pagination import paginate
 
 class TestAPI(unittest.TestCase):
     def setUp(self):
@@ -19,6 +21,9 @@ class TestAPI(unittest.TestCase):
             # Add System Manager role for testing
             user.add_roles("System Manager")
         
+        # Company Admin can access data of every company
+        frappe.get_doc("User", "test@api.com").add_roles("Company Admin")
+        
         frappe.set_user("test@api.com")
         
         # Create test company
@@ -42,6 +47,45 @@ class TestAPI(unittest.TestCase):
         self.assertTrue(response.get("success"))
         self.assertEqual(response["data"]["company_name"], "API Test Company")
     
+    def test_company_api_pagination(self):
+        # Create a second company so several pages exist with page_size=1
+        other = frappe.get_doc({
+            "doctype": "CM Company",
+            "company_name": "API Test Company Page Two"
+        })
+        other.insert()
+        
+        first_page, next_cursor = paginate("CM Company", page_size=1)
+        self.assertEqual(len(first_page), 1)
+        self.assertIsNotNone(next_cursor)
+        
+        # Walk every page: each company appears exactly once
+        names = [row.name for row in first_page]
+        while next_cursor:
+            page, next_cursor = paginate("CM Company", cursor=next_cursor, page_size=1)
+            names.extend(row.name for row in page)
+        
+        self.assertEqual(names.count(self.test_company.name), 1)
+        self.assertEqual(names.count(other.name), 1)
+        
+        # Invalid cursors are reported, not silently ignored
+        bad_page = company.get_companies(cursor="not-a-cursor")
+        self.assertFalse(bad_page.get("success"))
+        
+        # Clean up
+        frappe.delete_doc("CM Company", other.name)
+    
+    def test_company_api_stats_batch(self):
+        response = company.get_companies_stats(companies=json.dumps([self.test_company.name, "NonExistentCompany"]))
+        self.assertTrue(response.get("success"))
+        stats = response["data"][self.test_company.name]
+        self.assertEqual(stats["departments"], 0)
+        self.assertEqual(stats["employees"], 0)
+        self.assertEqual(stats["pending_reviews"], 0)
+        
+        # Unknown companies are left out instead of reported (and cached) as empty
+        self.assertNotIn("NonExistentCompany", response["data"])
+    
     def test_employee_crud_api(self):
         # Create test department first
         dept = frappe.get_doc({
@@ -146,6 +190,104 @@ class TestAPI(unittest.TestCase):
         frappe.delete_doc("CM Project", project_name)
         frappe.delete_doc("CM Department", dept.name)
     
+    def test_project_team_assignment_api(self):
+        # The test user is a Company Admin (see setUp), so company access checks pass
+        dept = frappe.get_doc({
+            "doctype": "CM Department",
+            "department_name": "API Team Test Dept",
+            "company": self.test_company.name
+        })
+        dept.insert()
+        
+        project_doc = frappe.get_doc({
+            "doctype": "CM Project",
+            "project_name": "API Team Test Project",
+            "company": self.test_company.name,
+            "department": dept.name,
+            "start_date": "2025-01-01"
+        })
+        project_doc.insert()
+        
+        members = []
+        for i in range(2):
+            member = frappe.get_doc({
+                "doctype": "CM Employee",
+                "employee_name": f"API Team Member {i}",
+                "email_address": f"member{i}@apiteam.com",
+                "company": self.test_company.name,
+                "department": dept.name
+            })
+            member.insert()
+            members.append(member)
+        
+        # Single assignment inserts one row; assigning again is rejected
+        response = project.assign_employee_to_project(project_doc.name, members[0].name, role="Developer")
+        self.assertTrue(response.get("success"))
+        self.assertEqual([row.employee for row in response["data"]["assigned_employees"]], [members[0].name])
+        self.assertEqual(response["data"]["assigned_employees"][0].idx, 1)
+        
+        response = project.assign_employee_to_project(project_doc.name, members[0].name)
+        self.assertFalse(response.get("success"))
+        
+        # Bulk assignment skips employees already on the team
+        response = project.bulk_assign_employees_to_project(project_doc.name,
+                                                            json.dumps([member.name for member in members]))
+        self.assertTrue(response.get("success"))
+        self.assertEqual([row["employee"] for row in response["data"]["assigned"]], [members[1].name])
+        self.assertEqual(response["data"]["already_assigned"], [members[0].name])
+        
+        # A single JSON-encoded name is one employee, not a list of characters
+        response = project.bulk_assign_employees_to_project(project_doc.name, json.dumps(members[1].name))
+        self.assertTrue(response.get("success"))
+        self.assertEqual(response["data"]["already_assigned"], [members[1].name])
+        
+        # Malformed entries are rejected before anything is assigned
+        response = project.bulk_assign_employees_to_project(project_doc.name, json.dumps([members[0].name, 42]))
+        self.assertFalse(response.get("success"))
+        self.assertIn("Invalid employee entry: 42", response["error"])
+        
+        # Teams are returned in row order, for one or many projects
+        response = project.get_project_teams(json.dumps([project_doc.name]))
+        self.assertTrue(response.get("success"))
+        self.assertEqual([row["employee"] for row in response["data"][project_doc.name]],
+                         [member.name for member in members])
+        
+        response = project.bulk_unassign_employees_from_project(project_doc.name, json.dumps([members[0].name]))
+        self.assertTrue(response.get("success"))
+        self.assertEqual(response["data"]["unassigned"], [members[0].name])
+        
+        response = project.get_project_team(project_doc.name)
+        self.assertEqual([row["employee"] for row in response["data"]], [members[1].name])
+        
+        # Clean up
+        frappe.delete_doc("CM Project", project_doc.name)
+        for member in members:
+            frappe.delete_doc("CM Employee", member.name)
+        frappe.delete_doc("CM Department", dept.name)
+    
+    def test_permission_matrix_follows_doctype_cache_clear(self):
+        if not frappe.db.exists("Role", "Test Matrix Role"):
+            frappe.get_doc({"doctype": "Role", "role_name": "Test Matrix Role"}).insert()
+        
+        perm = frappe.get_doc({
+            "doctype": "Custom DocPerm",
+            "parent": "Performance Review",
+            "parenttype": "DocType",
+            "parentfield": "permissions",
+            "role": "Test Matrix Role",
+            "read": 1
+        })
+        perm.insert()
+        self.assertTrue(check_role_permission("Test Matrix Role", "Performance Review", "read"))
+        
+        # Role Permission Manager updates rows directly and only clears the doctype cache
+        frappe.db.set_value("Custom DocPerm", perm.name, "read", 0)
+        frappe.clear_cache(doctype="Performance Review")
+        self.assertFalse(check_role_permission("Test Matrix Role", "Performance Review", "read"))
+        
+        # Clean up
+        frappe.delete_doc("Custom DocPerm", perm.name)
+    
     def test_api_error_handling(self):
         # Test accessing non-existent company
         response = company.get_company("NonExistentCompany")
@@ -0,0 +1,133 @@
+import time
+import frappe
+import unittest
+from unittest.mock import patch
+from company_management.company_management.utils import cache
+from company_management.company_management.utils.cache import (
+    acquire_recompute_lock,
+    get_cached_company_stats,
+    get_cached_company_stats_batch,
+    get_generations,
+    clear_cache_for_company,
+    local_cache,
+    make_versioned_key,
+    recompute_company_stats,
+    release_recompute_lock,
+)
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        # Create test company
+        self.company = frappe.get_doc({
+            "doctype": "CM Company",
+            "company_name": "Test Company for Cache"
+        })
+        self.company.insert()
+
+    def test_clear_cache_bumps_generation(self):
+        (before,) = get_generations(("company", self.company.name))
+        clear_cache_for_company(self.company.name)
+        (after,) = get_generations(("company", self.company.name))
+        self.assertEqual(after, before + 1)
+
+    def test_invalidation_repeated_after_commit(self):
+        (before,) = get_generations(("company", self.company.name))
+        clear_cache_for_company(self.company.name)
+        
+        # Entries cached by concurrent readers before commit are retired by a second bump
+        frappe.db.after_commit.run()
+        (after,) = get_generations(("company", self.company.name))
+        self.assertEqual(after, before + 2)
+    
+    def test_stats_invalidated_by_doc_events(self):
+        stats = get_cached_company_stats(self.company.name)
+        self.assertEqual(stats["departments"], 0)
+
+        # Creating a department must invalidate the cached stats of its company
+        dept = frappe.get_doc({
+            "doctype": "CM Department",
+            "department_name": "Test Department for Cache",
+            "company": self.company.name
+        })
+        dept.insert()
+
+        stats = get_cached_company_stats(self.company.name)
+        self.assertEqual(stats["departments"], 1)
+
+        # Clean up
+        frappe.delete_doc("CM Department", dept.name)
+
+    def test_local_tier_hits_and_invalidation(self):
+        get_cached_company_stats(self.company.name)
+        hits_before = local_cache.stats()["hits"]
+
+        # Second read is served by the in-process tier
+        get_cached_company_stats(self.company.name)
+        self.assertEqual(local_cache.stats()["hits"], hits_before + 1)
+
+        # Invalidation on this worker drops the local entry immediately
+        clear_cache_for_company(self.company.name)
+        self.assertIsNone(local_cache.get(("company_stats", self.company.name)))
+
+    def seed_stats_entry(self, stats, refresh_at):
+        """Store a company stats entry directly, bypassing the local tier"""
+        cache_key = make_versioned_key("company_stats", "company", self.company.name)
+        frappe.cache().set_value(cache_key, {"stats": stats, "refresh_at": refresh_at}, expires_in_sec=60)
+        local_cache.invalidate("company", self.company.name)
+        release_recompute_lock(cache_key)
+        return cache_key
+
+    def test_stale_stats_served_while_one_refresh_enqueued(self):
+        stale = {"departments": -1}
+        cache_key = self.seed_stats_entry(stale, time.time() - 1)
+
+        with patch("frappe.enqueue") as enqueue:
+            self.assertEqual(get_cached_company_stats(self.company.name), stale)
+            self.assertEqual(get_cached_company_stats(self.company.name), stale)
+            self.assertEqual(get_cached_company_stats_batch([self.company.name])[self.company.name], stale)
+
+        # The first caller takes the recompute lock; later callers do not enqueue again
+        self.assertEqual(enqueue.call_count, 1)
+        self.assertEqual(enqueue.call_args.kwargs["cache_key"], cache_key)
+        release_recompute_lock(cache_key)
+
+    def test_failed_refresh_enqueue_releases_lock(self):
+        cache_key = self.seed_stats_entry({"departments": -1}, time.time() - 1)
+
+        for get_stats in (get_cached_company_stats, lambda name: get_cached_company_stats_batch([name])):
+            with patch("frappe.enqueue", side_effect=Exception("Queue unavailable")):
+                with self.assertRaises(Exception):
+                    get_stats(self.company.name)
+            local_cache.invalidate("company", self.company.name)
+
+            # The lock is free again for the next caller
+            self.assertTrue(acquire_recompute_lock(cache_key))
+            release_recompute_lock(cache_key)
+
+    def test_recompute_waits_for_lock_holder(self):
+        cache_key = make_versioned_key("company_stats", "company", self.company.name)
+        self.assertTrue(acquire_recompute_lock(cache_key))
+        try:
+            # Another worker holds the lock and stores fresh stats: the waiter returns them
+            fresh = {"departments": -2}
+            frappe.cache().set_value(cache_key, {"stats": fresh, "refresh_at": time.time() + 60},
+                                     expires_in_sec=60)
+            with patch.object(cache, "calculate_company_stats") as calculate:
+                self.assertEqual(recompute_company_stats(self.company.name, cache_key), fresh)
+            calculate.assert_not_called()
+
+            # The lock holder never finishes: the waiter falls back to the stale entry
+            frappe.cache().delete_value(cache_key)
+            stale_entry = {"stats": {"departments": -3}, "refresh_at": time.time() - 1}
+            with patch.object(cache, "RECOMPUTE_WAIT_SEC", 0.1):
+                self.assertEqual(recompute_company_stats(self.company.name, cache_key, stale_entry=stale_entry),
+                                 stale_entry["stats"])
+        finally:
+            release_recompute_lock(cache_key)
+
+    def tearDown(self):
+        # Clean up test data
+        try:
+            frappe.delete_doc("CM Company", self.company.name)
+        except:
+            pass
@@ -1,5 +1,10 @@
 import frappe
 import unittest
+from company_management.company_management.utils.counters import (
+    defer_counter_updates,
+    flush_dirty_counters,
+    reconcile_counters,
+)
 
 class TestCompany(unittest.TestCase):
     def setUp(self):
@@ -65,6 +70,87 @@ class TestCompany(unittest.TestCase):
         frappe.delete_doc("CM Employee", emp.name)
         frappe.delete_doc("CM Department", dept.name)
     
+    def test_deferred_counter_flush(self):
+        # Inserts inside defer_counter_updates only queue their parents
+        with defer_counter_updates():
+            departments = []
+            for i in range(2):
+                dept = frappe.get_doc({
+                    "doctype": "CM Department",
+                    "department_name": f"Deferred Department {i}",
+                    "company": self.company.name
+                })
+                dept.insert()
+                departments.append(dept)
+            
+            employees = []
+            for i in range(3):
+                emp = frappe.get_doc({
+                    "doctype": "CM Employee",
+                    "employee_name": f"Deferred Employee {i}",
+                    "email_address": f"deferred{i}@testcompany.com",
+                    "company": self.company.name,
+                    "department": departments[0].name
+                })
+                emp.insert()
+                employees.append(emp)
+        
+        # One recount per dirty parent, normally run at commit
+        flush_dirty_counters()
+        
+        self.company.reload()
+        self.assertEqual(self.company.number_of_departments, 2)
+        self.assertEqual(self.company.number_of_employees, 3)
+        self.assertEqual(frappe.db.get_value("CM Department", departments[0].name, "number_of_employees"), 3)
+        self.assertEqual(frappe.db.get_value("CM Department", departments[1].name, "number_of_employees"), 0)
+        
+        # Clean up
+        for emp in employees:
+            frappe.delete_doc("CM Employee", emp.name)
+        for dept in departments:
+            frappe.delete_doc("CM Department", dept.name)
+    
+    def test_counter_reconciliation(self):
+        # Simulate drift introduced by direct SQL
+        frappe.db.set_value("CM Company", self.company.name, "number_of_departments", 42,
+                            update_modified=False)
+        
+        summary = reconcile_counters()
+        
+        self.company.reload()
+        self.assertEqual(self.company.number_of_departments, 0)
+        self.assertGreaterEqual(summary["CM Company"]["drifted"], 1)
+        self.assertGreaterEqual(summary["CM Company"]["fields"]["number_of_departments"], 1)
+    
+    def test_department_counter_reconciliation(self):
+        dept = frappe.get_doc({
+            "doctype": "CM Department",
+            "department_name": "Reconciled Department",
+            "company": self.company.name
+        })
+        dept.insert()
+        
+        emp = frappe.get_doc({
+            "doctype": "CM Employee",
+            "employee_name": "Reconciled Employee",
+            "email_address": "reconciled@testcompany.com",
+            "company": self.company.name,
+            "department": dept.name
+        })
+        emp.insert()
+        
+        # Simulate drift on the department counters
+        frappe.db.set_value("CM Department", dept.name, "number_of_employees", 7, update_modified=False)
+        
+        summary = reconcile_counters()
+        
+        self.assertEqual(frappe.db.get_value("CM Department", dept.name, "number_of_employees"), 1)
+        self.assertGreaterEqual(summary["CM Department"]["fields"]["number_of_employees"], 1)
+        
+        # Clean up
+        frappe.delete_doc("CM Employee", emp.name)
+        frappe.delete_doc("CM Department", dept.name)
+    
     def tearDown(self):
         # Clean up test data
         try:
@@ -1,6 +1,8 @@
 import frappe
 import unittest
 from frappe.utils import getdate, date_diff
+from company_management.company_management.api.performance_review import get_reviews_by_employee
+from company_management.company_management.utils.cache import calculate_employee_performance
 
 class TestEmployee(unittest.TestCase):
     def setUp(self):
@@ -92,6 +94,90 @@ class TestEmployee(unittest.TestCase):
         # Clean up
         frappe.delete_doc("CM Employee", employee.name)
     
+    def test_department_change_moves_count(self):
+        other_department = frappe.get_doc({
+            "doctype": "CM Department",
+            "department_name": "Other Department for Employee",
+            "company": self.company.name
+        })
+        other_department.insert()
+        
+        employee = frappe.get_doc({
+            "doctype": "CM Employee",
+            "employee_name": "Test Employee Transfer",
+            "email_address": "test.transfer@employee.com",
+            "company": self.company.name,
+            "department": self.department.name
+        })
+        employee.insert()
+        
+        self.department.reload()
+        count_before = self.department.number_of_employees
+        
+        # Transfer to the other department
+        employee.department = other_department.name
+        employee.save()
+        
+        self.department.reload()
+        other_department.reload()
+        self.assertEqual(self.department.number_of_employees, count_before - 1)
+        self.assertEqual(other_department.number_of_employees, 1)
+        
+        # Company count is unchanged by a transfer within the company
+        self.company.reload()
+        self.assertEqual(self.company.number_of_employees, 1)
+        
+        # Deleting the employee decrements the new department
+        frappe.delete_doc("CM Employee", employee.name)
+        other_department.reload()
+        self.assertEqual(other_department.number_of_employees, 0)
+        
+        # Clean up
+        frappe.delete_doc("CM Department", other_department.name)
+    
+    def test_performance_summary_by_year(self):
+        employee, reviewer = [frappe.get_doc({
+            "doctype": "CM Employee",
+            "employee_name": f"Test {role} Performance",
+            "email_address": f"test.{role.lower()}@performance.com",
+            "company": self.company.name,
+            "department": self.department.name
+        }).insert() for role in ("Employee", "Reviewer")]
+        
+        reviews = []
+        for period_end, overall_rating in (("2023-06-30", "4 - Good"), ("2023-12-31", ""),
+                                           ("2024-06-30", "2 - Below Average"), ("2024-12-31", "5 - Excellent")):
+            reviews.append(frappe.get_doc({
+                "doctype": "Performance Review",
+                "employee": employee.name,
+                "reviewer": reviewer.name,
+                "review_period_start": f"{period_end[:4]}-01-01",
+                "review_period_end": period_end,
+                "overall_rating": overall_rating,
+                "workflow_state": "Pending Review"
+            }).insert())
+        
+        performance = calculate_employee_performance(employee.name)
+        self.assertEqual(performance["total_reviews"], 4)
+        self.assertEqual(performance["latest_rating"], "5 - Excellent")
+        # Unrated reviews are counted but left out of the averages
+        self.assertEqual(performance["average_rating"], round(11 / 3, 2))
+        self.assertEqual(performance["reviews_by_year"][2023],
+                         {"total_reviews": 2, "rated_reviews": 1, "average_rating": 4})
+        self.assertEqual(performance["reviews_by_year"][2024],
+                         {"total_reviews": 2, "rated_reviews": 2, "average_rating": 3.5})
+        
+        # Drilling down into a year lists only its reviews, latest first
+        response = get_reviews_by_employee(employee.name, year="2023")
+        self.assertTrue(response.get("success"))
+        self.assertEqual([review.name for review in response["data"]], [reviews[1].name, reviews[0].name])
+        
+        # Clean up
+        for review in reviews:
+            frappe.delete_doc("Performance Review", review.name)
+        frappe.delete_doc("CM Employee", employee.name)
+        frappe.delete_doc("CM Employee", reviewer.name)
+    
     def tearDown(self):
         # Clean up test data
         try:
@@ -0,0 +1,221 @@
+import frappe
+import unittest
+from unittest.mock import patch
+from frappe.permissions import add_permission, update_permission_property
+from company_management.company_management.api import performance_review
+
+SCOPED_USER = "test.scoped@permissions.com"
+ADMIN_USER = "test.admin@permissions.com"
+MANAGER_USER = "test.manager@permissions.com"
+
+class TestCompanyPermissions(unittest.TestCase):
+    def setUp(self):
+        frappe.set_user("Administrator")
+        self.docs = []
+        self.custom_perm_filters = None
+
+        # Two companies, each with a department, two employees and a review
+        self.company_a, self.employee_a, self.review_a = self.create_company_data("A")
+        self.company_b, self.employee_b, self.review_b = self.create_company_data("B")
+
+        # Both users can read the doctypes; only the admin is a Company Admin
+        self.create_user(SCOPED_USER, ["System Manager"])
+        self.create_user(ADMIN_USER, ["System Manager", "Company Admin"])
+
+        # The scoped user belongs to company A
+        self.create_user_account(SCOPED_USER, self.company_a.name)
+        self.custom_perms_added = False
+
+    def create_company_data(self, suffix):
+        company = frappe.get_doc({
+            "doctype": "CM Company",
+            "company_name": f"Test Company for Permissions {suffix}"
+        })
+        company.insert()
+
+        department = frappe.get_doc({
+            "doctype": "CM Department",
+            "department_name": f"Test Department for Permissions {suffix}",
+            "company": company.name
+        })
+        department.insert()
+
+        employees = []
+        for role in ("employee", "reviewer"):
+            employee = frappe.get_doc({
+                "doctype": "CM Employee",
+                "employee_name": f"Test {role.title()} Permissions {suffix}",
+                "email_address": f"test.{role}.{suffix.lower()}@permissions.com",
+                "company": company.name,
+                "department": department.name
+            })
+            employee.insert()
+            employees.append(employee)
+
+        review = frappe.get_doc({
+            "doctype": "Performance Review",
+            "employee": employees[0].name,
+            "reviewer": employees[1].name,
+            "review_period_start": "2024-01-01",
+            "review_period_end": "2024-12-31",
+            "workflow_state": "Pending Review"
+        })
+        review.insert()
+
+        # Deleted in reverse order of creation
+        self.docs.extend([company, department, *employees, review])
+        return company, employees[0], review
+
+    def create_user_account(self, email, company):
+        account = frappe.get_doc({
+            "doctype": "User Account",
+            "full_name": "Test Permissions Account",
+            "email_address": email,
+            "user_type": "Employee",
+            "company": company,
+            "is_active": 1
+        })
+        account.insert(ignore_links=True)
+        self.docs.append(account)
+
+    def create_user(self, email, roles):
+        if not frappe.db.exists("User", email):
+            frappe.get_doc({
+                "doctype": "User",
+                "email": email,
+                "first_name": "Test",
+                "last_name": "Permissions",
+                "send_welcome_email": 0
+            }).insert()
+        frappe.get_doc("User", email).add_roles(*roles)
+
+    def get_names(self, doctype, filters):
+        return {row.name for row in frappe.get_list(doctype, filters=filters)}
+
+    def test_scoped_user_lists_only_own_company(self):
+        companies = [self.company_a.name, self.company_b.name]
+        own_employees = set(frappe.get_all("CM Employee", filters={"company": self.company_a.name}, pluck="name"))
+        frappe.set_user(SCOPED_USER)
+
+        self.assertEqual(self.get_names("CM Company", {"name": ["in", companies]}),
+                         {self.company_a.name})
+        self.assertEqual(self.get_names("CM Employee", {"company": ["in", companies]}),
+                         own_employees)
+        self.assertEqual(self.get_names("Performance Review",
+                                        {"name": ["in", [self.review_a.name, self.review_b.name]]}),
+                         {self.review_a.name})
+
+        # Filtering on the other company explicitly still returns nothing
+        self.assertEqual(self.get_names("CM Employee", {"company": self.company_b.name}), set())
+
+    def test_scoped_user_denied_other_company_documents(self):
+        frappe.set_user(SCOPED_USER)
+
+        self.assertTrue(frappe.has_permission("CM Company", "read", doc=self.company_a.name))
+        self.assertTrue(frappe.has_permission("CM Employee", "read", doc=self.employee_a.name))
+        self.assertTrue(frappe.has_permission("Performance Review", "read", doc=self.review_a.name))
+
+        self.assertFalse(frappe.has_permission("CM Company", "read", doc=self.company_b.name))
+        self.assertFalse(frappe.has_permission("CM Employee", "read", doc=self.employee_b.name))
+        self.assertFalse(frappe.has_permission("Performance Review", "read", doc=self.review_b.name))
+
+    def test_company_admin_sees_every_company(self):
+        frappe.set_user(ADMIN_USER)
+        companies = [self.company_a.name, self.company_b.name]
+
+        self.assertEqual(self.get_names("CM Company", {"name": ["in", companies]}), set(companies))
+        self.assertEqual(self.get_names("Performance Review",
+                                        {"name": ["in", [self.review_a.name, self.review_b.name]]}),
+                         {self.review_a.name, self.review_b.name})
+        self.assertTrue(frappe.has_permission("CM Employee", "read", doc=self.employee_b.name))
+        self.assertTrue(frappe.has_permission("Performance Review", "read", doc=self.review_b.name))
+
+    def test_bulk_workflow_action_results_per_review(self):
+        # A Department Manager of company A who may edit reviews
+        # Adding a permission copies the standard ones to Custom DocPerm when none exist yet
+        self.custom_perm_filters = {"parent": "Performance Review"}
+        if frappe.db.exists("Custom DocPerm", self.custom_perm_filters):
+            self.custom_perm_filters["role"] = "Department Manager"
+        add_permission("Performance Review", "Department Manager")
+        update_permission_property("Performance Review", "Department Manager", 0, "write", 1)
+        self.create_user(MANAGER_USER, ["Department Manager"])
+        self.create_user_account(MANAGER_USER, self.company_a.name)
+
+        pending = frappe.get_doc({
+            "doctype": "Performance Review",
+            "employee": self.employee_a.name,
+            "reviewer": self.review_a.reviewer,
+            "review_period_start": "2023-01-01",
+            "review_period_end": "2023-12-31",
+            "workflow_state": "Pending Review"
+        })
+        pending.insert()
+        self.docs.append(pending)
+        for review in (self.review_a, self.review_b):
+            frappe.db.set_value("Performance Review", review.name, "workflow_state", "Feedback Provided")
+
+        frappe.set_user(MANAGER_USER)
+        response = performance_review.bulk_workflow_action(
+            names=frappe.as_json([self.review_a.name, pending.name, self.review_b.name]),
+            action="Submit for Approval")
+        self.assertTrue(response.get("success"))
+        results = response["data"]
+        self.assertEqual(results[self.review_a.name], {"success": True, "workflow_state": "Under Approval"})
+        self.assertEqual(results[pending.name]["error"], "Invalid action for current state")
+        # Reviews of another company are reported as not found
+        self.assertEqual(results[self.review_b.name]["error"], "Performance Review not found")
+
+        # Approval is reserved to Company Admins
+        response = performance_review.bulk_workflow_action(names=frappe.as_json([self.review_a.name]),
+                                                           action="Approve Review")
+        self.assertEqual(response["data"][self.review_a.name]["error"], "Insufficient permissions for this action")
+        self.assertEqual(frappe.db.get_value("Performance Review", self.review_a.name, "workflow_state"),
+                         "Under Approval")
+
+    def test_bulk_workflow_action_background_results(self):
+        for review in (self.review_a, self.review_b):
+            frappe.db.set_value("Performance Review", review.name, "workflow_state", "Feedback Provided")
+
+        frappe.set_user(SCOPED_USER)
+        names = [self.review_a.name, self.review_b.name]
+        with patch.object(performance_review, "BULK_ACTION_BACKGROUND_THRESHOLD", 0), \
+                patch("frappe.enqueue") as enqueue:
+            response = performance_review.bulk_workflow_action(names=frappe.as_json(names),
+                                                               action="Submit for Approval")
+
+        job_id = response["job_id"]
+        self.assertEqual(enqueue.call_args.kwargs["names"], [self.review_a.name])
+        self.assertEqual(response["data"][self.review_a.name], {"success": True, "queued": True})
+
+        # The status is published once the request commits, then updated by the job
+        frappe.db.after_commit.run()
+        status = performance_review.get_bulk_workflow_action_status(job_id)
+        self.assertEqual(status["data"]["status"], "Queued")
+
+        performance_review.run_bulk_workflow_action(job_id, [self.review_a.name], "Submit for Approval")
+        status = performance_review.get_bulk_workflow_action_status(job_id)["data"]
+        self.assertEqual(status["status"], "Completed")
+        self.assertEqual(status["results"][self.review_a.name],
+                         {"success": True, "workflow_state": "Under Approval"})
+        self.assertEqual(status["results"][self.review_b.name]["error"], "Performance Review not found")
+
+        # Other users cannot read the results
+        frappe.set_user(ADMIN_USER)
+        self.assertFalse(performance_review.get_bulk_workflow_action_status(job_id).get("success"))
+
+    def tearDown(self):
+        frappe.set_user("Administrator")
+        if self.custom_perm_filters:
+            frappe.db.delete("Custom DocPerm", self.custom_perm_filters)
+            frappe.clear_cache(doctype="Performance Review")
+
+        # Clean up test data
+        try:
+            for doc in reversed(self.docs):
+                frappe.delete_doc(doc.doctype, doc.name)
+            frappe.delete_doc("User", SCOPED_USER)
+            frappe.delete_doc("User", ADMIN_USER)
+            if frappe.db.exists("User", MANAGER_USER):
+                frappe.delete_doc("User", MANAGER_USER)
+        except:
+            pass
\ No newline at end of file
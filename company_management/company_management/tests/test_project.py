@@ -150,6 +150,56 @@ class TestProject(unittest.TestCase):
         frappe.delete_doc("CM Department", other_dept.name)
         frappe.delete_doc("CM Company", other_company.name)
     
+    def test_employee_company_validation_reports_all(self):
+        # Every offending assignee is reported in one error
+        other_company = frappe.get_doc({
+            "doctype": "CM Company",
+            "company_name": "Other Test Company Batch"
+        })
+        other_company.insert()
+        
+        other_dept = frappe.get_doc({
+            "doctype": "CM Department",
+            "department_name": "Other Dept Batch",
+            "company": other_company.name
+        })
+        other_dept.insert()
+        
+        other_employees = []
+        for i in range(2):
+            other_employee = frappe.get_doc({
+                "doctype": "CM Employee",
+                "employee_name": f"Other Company Employee {i}",
+                "email_address": f"other{i}@batch.com",
+                "company": other_company.name,
+                "department": other_dept.name
+            })
+            other_employee.insert()
+            other_employees.append(other_employee)
+        
+        project = frappe.get_doc({
+            "doctype": "CM Project",
+            "project_name": "Batch Validation Project",
+            "company": self.company.name,
+            "start_date": "2025-01-01"
+        })
+        project.append('assigned_employees', {'employee': self.employee.name, 'role': 'Developer'})
+        for other_employee in other_employees:
+            project.append('assigned_employees', {'employee': other_employee.name, 'role': 'Developer'})
+        
+        with self.assertRaises(frappe.ValidationError) as context:
+            project.insert()
+        
+        for other_employee in other_employees:
+            self.assertIn(other_employee.name, str(context.exception))
+        self.assertNotIn(self.employee.name, str(context.exception))
+        
+        # Clean up
+        for other_employee in other_employees:
+            frappe.delete_doc("CM Employee", other_employee.name)
+        frappe.delete_doc("CM Department", other_dept.name)
+        frappe.delete_doc("CM Company", other_company.name)
+    
     def tearDown(self):
         # Clean up test data
         try:
@@ -1,5 +1,27 @@
+import json
 import frappe
 import unittest
+from unittest.mock import patch
+from frappe.utils import add_days, now_datetime
+from company_management.company_management.api.performance_review import get_aging_reviews
+from company_management.company_management.utils.transactions import run_after_commit, savepoint
+from company_management.company_management.workflow.engine import (
+    apply_transition,
+    compile_transition_table,
+    get_allowed_actions,
+    get_transition,
+)
+from company_management.company_management.workflow.inbox import clear_inbox_counts, get_inbox_changes, get_inbox_counts
+from company_management.company_management.workflow.notifications import (
+    drain_notification_queue,
+    get_digests,
+    send_notification_digests,
+)
+from company_management.company_management.workflow.performance_review_workflow import (
+    WORKFLOW_STATES,
+    WORKFLOW_TRANSITIONS,
+)
+from company_management.company_management.workflow.review_cycle import generate_review_cycle
 
 class TestWorkflow(unittest.TestCase):
     def setUp(self):
@@ -182,6 +204,203 @@ class TestWorkflow(unittest.TestCase):
         
         self.assertEqual(self.review.submitted_for_approval, 1)
     
+    def test_compiled_transition_table(self):
+        """Test the compiled (state, action) transition table"""
+        table = compile_transition_table(WORKFLOW_STATES, WORKFLOW_TRANSITIONS)
+        
+        approve = table[("Under Approval", "Approve Review")]
+        self.assertEqual(approve.next_state, "Review Approved")
+        self.assertEqual(approve.doc_status, 1)
+        self.assertIn("Company Admin", approve.roles)
+        self.assertNotIn("Department Manager", approve.roles)
+        
+        # Actions are only valid from their source state
+        self.assertNotIn(("Pending Review", "Approve Review"), table)
+        
+        # Rows for the same state and action (one per role in a Workflow doc) are merged
+        table = compile_transition_table(WORKFLOW_STATES, [
+            {"state": "Pending Review", "action": "Schedule Review",
+             "next_state": "Review Scheduled", "allowed": "Company Admin"},
+            {"state": "Pending Review", "action": "Schedule Review",
+             "next_state": "Review Scheduled", "allowed": "Department Manager"}
+        ])
+        self.assertEqual(table[("Pending Review", "Schedule Review")].roles,
+                         frozenset({"Company Admin", "Department Manager"}))
+    
+    def test_allowed_actions_by_role(self):
+        """Test that available actions follow the roles allowed on each transition"""
+        self.assertEqual(get_allowed_actions("Under Approval", roles=["Department Manager"]), [])
+        self.assertEqual(sorted(get_allowed_actions("Under Approval", roles=["Company Admin"])),
+                         ["Approve Review", "Reject Review"])
+    
+    def test_submit_for_approval_action_flags_review(self):
+        """Test that entering Under Approval through the engine sets submitted_for_approval"""
+        self.review.workflow_state = "Feedback Provided"
+        self.review.feedback = "Good performance overall"
+        self.review.save()
+        
+        apply_transition(self.review, get_transition("Feedback Provided", "Submit for Approval"))
+        self.assertEqual(self.review.workflow_state, "Under Approval")
+        self.assertEqual(self.review.submitted_for_approval, 1)
+    
+    def test_numeric_rating_derived(self):
+        """Test that the numeric rating follows overall_rating"""
+        self.assertEqual(self.review.rating, 0)
+        
+        self.review.overall_rating = "4 - Good"
+        self.review.save()
+        self.assertEqual(self.review.rating, 4)
+        
+        self.review.overall_rating = ""
+        self.review.save()
+        self.assertEqual(self.review.rating, 0)
+    
+    def test_state_entry_tracking(self):
+        """Test that state changes stamp state_entered_at and extend the transition history"""
+        self.assertIsNotNone(self.review.state_entered_at)
+        self.assertEqual([entry[0] for entry in json.loads(self.review.transition_history)],
+                         ["Pending Review"])
+        
+        # Saving without a state change keeps the entry timestamp
+        entered_at = self.review.state_entered_at
+        self.review.feedback = "Progress notes"
+        self.review.save()
+        self.assertEqual(self.review.state_entered_at, entered_at)
+        
+        self.review.workflow_state = "Under Approval"
+        self.review.save()
+        self.assertEqual([entry[0] for entry in json.loads(self.review.transition_history)],
+                         ["Pending Review", "Under Approval"])
+    
+    def test_reviewer_inbox_counts(self):
+        """Test reviewer inbox counters and the changes applied on transitions"""
+        clear_inbox_counts([self.reviewer.name])
+        counts = get_inbox_counts(self.reviewer.name)
+        self.assertEqual(counts["Pending Review"], 1)
+        self.assertEqual(counts["Under Approval"], 0)
+        
+        # Moving a review between inbox states moves one count
+        self.assertEqual(get_inbox_changes((self.reviewer.name, "Pending Review"),
+                                           (self.reviewer.name, "Under Approval")),
+                         [(self.reviewer.name, "Pending Review", -1), (self.reviewer.name, "Under Approval", 1)])
+        
+        # Leaving the inbox only decrements; saves without a change do nothing
+        self.assertEqual(get_inbox_changes((self.reviewer.name, "Under Approval"),
+                                           (self.reviewer.name, "Review Approved")),
+                         [(self.reviewer.name, "Under Approval", -1)])
+        self.assertEqual(get_inbox_changes((self.reviewer.name, "Pending Review"),
+                                           (self.reviewer.name, "Pending Review")), [])
+    
+    def test_savepoint_drops_callbacks_on_rollback(self):
+        """Test that after-commit callbacks of work rolled back to a savepoint never run"""
+        calls = []
+        with self.assertRaises(frappe.ValidationError):
+            with savepoint("test_workflow_savepoint"):
+                run_after_commit(lambda: calls.append("rolled back"))
+                frappe.throw("Simulated failure")
+        
+        with savepoint("test_workflow_savepoint"):
+            run_after_commit(lambda: calls.append("released"))
+        
+        frappe.db.after_commit.run()
+        self.assertEqual(calls, ["released"])
+    
+    def test_review_cycle_generation_is_idempotent(self):
+        """Test that relaunching a review cycle creates one review per employee with contiguous names"""
+        frappe.db.set_value("CM Employee", self.employee.name, "manager", self.reviewer.name)
+        team_member = frappe.get_doc({
+            "doctype": "CM Employee",
+            "employee_name": "Test Team Member Workflow",
+            "email_address": "test.member@workflow.com",
+            "company": self.company.name,
+            "department": self.department.name,
+            "manager": self.reviewer.name
+        })
+        team_member.insert()
+        
+        period = {"review_period_start": "2023-01-01", "review_period_end": "2023-12-31"}
+        first = generate_review_cycle(self.company.name, **period)
+        second = generate_review_cycle(self.company.name, **period)
+        
+        # The reviewer has no manager of their own and is skipped
+        self.assertEqual(first["created"], 2)
+        self.assertEqual(first["skipped_no_manager"], 1)
+        self.assertEqual(second["created"], 0)
+        self.assertEqual(second["skipped_existing"], 2)
+        
+        reviews = frappe.get_all("Performance Review", filters=period,
+                                 fields=["name", "employee", "reviewer", "workflow_state", "rating", "state_entered_at"],
+                                 order_by="name asc")
+        self.assertEqual(sorted(review.employee for review in reviews),
+                         sorted([self.employee.name, team_member.name]))
+        for review in reviews:
+            self.assertEqual(review.reviewer, self.reviewer.name)
+            self.assertEqual(review.workflow_state, "Pending Review")
+            self.assertEqual(review.rating, 0)
+            self.assertIsNotNone(review.state_entered_at)
+        
+        # Names come from one reservation of the naming series
+        numbers = [int(review.name.rsplit("-", 1)[1]) for review in reviews]
+        self.assertEqual(numbers[1], numbers[0] + 1)
+        
+        # Clean up (the generator commits)
+        for review in reviews:
+            frappe.delete_doc("Performance Review", review.name)
+        frappe.delete_doc("CM Employee", team_member.name)
+        frappe.db.commit()
+    
+    def test_aging_reviews_listed_oldest_first(self):
+        """Test that reviews past the SLA are listed with their department"""
+        self.review.workflow_state = "Under Approval"
+        self.review.save()
+        frappe.db.set_value("Performance Review", self.review.name, "state_entered_at",
+                            add_days(now_datetime(), -30), update_modified=False)
+        
+        response = get_aging_reviews("Under Approval", 14, company=self.company.name, page_size=10)
+        self.assertTrue(response.get("success"))
+        self.assertEqual([review.name for review in response["data"]], [self.review.name])
+        self.assertEqual(response["data"][0].department, self.department.name)
+        self.assertGreaterEqual(response["data"][0].days_in_state, 30)
+        
+        # Reviews inside the SLA window are not listed
+        response = get_aging_reviews("Under Approval", 60, company=self.company.name)
+        self.assertEqual(response["data"], [])
+    
+    def test_transition_notifications_sent_as_digest(self):
+        """Test that committed transitions are queued and grouped into one digest per recipient"""
+        drain_notification_queue()
+        
+        self.review.workflow_state = "Review Approved"
+        self.review.save()
+        
+        # Nothing is queued before the transaction commits
+        self.assertEqual(drain_notification_queue(), [])
+        frappe.db.after_commit.run()
+        
+        events = drain_notification_queue()
+        self.assertEqual(events, [{
+            "review": self.review.name,
+            "state": "Review Approved",
+            "employee": self.employee.name,
+            "reviewer": self.reviewer.name
+        }])
+        self.assertEqual(get_digests(events), {
+            self.employee.email_address: {"Review Approved": [self.review.name]},
+            self.reviewer.email_address: {"Review Approved": [self.review.name]}
+        })
+        
+        # The scheduled job drains the queue and mails each recipient once
+        self.review.workflow_state = "Review Rejected"
+        self.review.save()
+        frappe.db.after_commit.run()
+        with patch("frappe.sendmail") as sendmail:
+            send_notification_digests()
+        
+        self.assertEqual(sendmail.call_count, 1)
+        self.assertEqual(sendmail.call_args.kwargs["recipients"], [self.reviewer.email_address])
+        self.assertIn(self.review.name, sendmail.call_args.kwargs["message"])
+        self.assertEqual(drain_notification_queue(), [])
+    
     def tearDown(self):
         # Clean up test data
         try:
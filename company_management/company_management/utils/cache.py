@@ -1,102 +1,459 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
 import frappe
+from company_management.company_management.auth.user_context import get_user_context
 from company_management.company_management.utils.logging_config import logger
+from company_management.company_management.utils.transactions import run_after_commit
 
-def get_cached_company_stats(company_name):
-    """Get cached company statistics"""
-    cache_key = f"company_stats_{company_name}"
-    cached_data = frappe.cache().get_value(cache_key)
+GENERATION_KEY_PREFIX = "cm_cache_generation"
+
+# Entries are invalidated by doc events (see invalidate_cache_for_doc), so TTLs can be long
+COMPANY_STATS_TTL = 24 * 3600
+# Workflow states counted as pending in company stats
+PENDING_REVIEW_STATES = ("Pending Review", "Review Scheduled", "Under Approval")
+
+# Company stats older than this are served stale while one worker refreshes them
+COMPANY_STATS_SOFT_TTL = 15 * 60
+EMPLOYEE_PERFORMANCE_TTL = 24 * 3600
+
+# Cache keys embed generation counters (global, per company, per employee).
+# Invalidation is a single INCR of the relevant counter; entries written under
+# an older generation are never read again and age out through their TTL.
+
+class LocalLRUCache:
+    """Bounded per-worker LRU tier in front of Redis
+
+    Entries live for a few seconds and are tagged with the invalidation scopes
+    they depend on. Invalidations on this worker drop matching entries at once;
+    other workers converge within the local TTL.
+    """
+
+    def __init__(self, maxsize=2048, ttl=5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        key = (frappe.local.site, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, scopes=()):
+        site = frappe.local.site
+        key = (site, key)
+        scopes = frozenset((site, *scope) for scope in scopes)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, scopes, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, scope, name=None):
+        """Drop every entry of this site tagged with (scope, name); "global" drops the whole site"""
+        site = frappe.local.site
+        tag = (site, scope, name)
+        with self._lock:
+            stale = [key for key, (_, scopes, _) in self._entries.items()
+                     if key[0] == site and (scope == "global" or tag in scopes)]
+            for key in stale:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+local_cache = LocalLRUCache()
+
+@frappe.whitelist()
+def get_local_cache_stats():
+    """Hit, miss and eviction counts of this worker's in-process cache tier"""
+    frappe.only_for("System Manager")
+    return local_cache.stats()
+
+def get_generation_key(scope, name=None):
+    """Redis key of a generation counter ("global", "company" or "employee")"""
+    key = f"{GENERATION_KEY_PREFIX}::{scope}"
+    if name:
+        key = f"{key}::{name}"
+    return frappe.cache().make_key(key)
+
+def get_generations(*scopes):
+    """Current generation of each (scope, name) pair, read in one round trip"""
+    keys = [get_generation_key(scope, name) for scope, name in scopes]
+    return tuple(int(value or 0) for value in frappe.cache().mget(keys))
+
+def bump_generation(scope, name=None):
+    """Invalidate every cache entry of a namespace with a single INCR"""
+    local_cache.invalidate(scope, name)
+    return frappe.cache().incr(get_generation_key(scope, name))
+
+def bump_generations(scope, names):
+    """Invalidate many namespaces of one scope with a single pipelined round trip"""
+    bump_scopes([(scope, name) for name in names])
+
+def bump_scopes(scopes):
+    """Bump the generation of each (scope, name) pair in one pipelined round trip"""
+    pipeline = frappe.cache().pipeline()
+    for scope, name in scopes:
+        local_cache.invalidate(scope, name)
+        pipeline.incr(get_generation_key(scope, name))
+    pipeline.execute()
+
+def invalidate_scopes(scopes):
+    """Bump generations now and again once the current transaction commits
+
+    The first bump keeps reads later in this transaction fresh. A concurrent
+    request can still cache the pre-commit rows under the new generation, so
+    the bump after commit retires those entries too.
+    """
+    scopes = list(scopes)
+    if not scopes:
+        return
+    bump_scopes(scopes)
+    run_after_commit(lambda: bump_scopes(scopes))
+
+def make_versioned_key(prefix, scope, name):
+    """Cache key for `name` under the current global and `scope` generations"""
+    global_generation, scope_generation = get_generations(("global", None), (scope, name))
+    return f"{prefix}::{name}::g{global_generation}.{scope_generation}"
+
+# Single-flight recompute: only the holder of a key's lock recomputes it
+RECOMPUTE_LOCK_TTL = 30
+RECOMPUTE_WAIT_SEC = 5
+RECOMPUTE_POLL_SEC = 0.05
+
+def acquire_recompute_lock(cache_key):
+    """Try to become the single worker recomputing `cache_key`"""
+    cache = frappe.cache()
+    return bool(cache.set(cache.make_key(f"{cache_key}::lock"), 1, nx=True, ex=RECOMPUTE_LOCK_TTL))
+
+def release_recompute_lock(cache_key):
+    cache = frappe.cache()
+    cache.delete(cache.make_key(f"{cache_key}::lock"))
+
+def get_cached_company_stats(company_name, stale_while_revalidate=True):
+    """Get cached company statistics
+
+    Fresh entries are returned directly. Once an entry passes its soft TTL it is
+    served stale while a background job refreshes it (or, without
+    stale_while_revalidate, recomputed synchronously). On a miss only one caller
+    recomputes; concurrent callers wait for its result instead of recomputing too.
+    """
+    local_key = ("company_stats", company_name)
+    stats = local_cache.get(local_key)
+    if stats is not None:
+        return stats
     
-    if not cached_data:
-        # Calculate fresh data
+    cache_key = make_versioned_key("company_stats", "company", company_name)
+    entry = frappe.cache().get_value(cache_key, expires=True)
+    
+    if entry and entry["refresh_at"] > time.time():
+        logger.debug(f"Retrieved cached stats for company: {company_name}")
+        local_cache.set(local_key, entry["stats"], scopes=[("company", company_name)])
+        return entry["stats"]
+    
+    if entry and stale_while_revalidate:
+        if acquire_recompute_lock(cache_key):
+            try:
+                frappe.enqueue(
+                    "company_management.company_management.utils.cache.refresh_company_stats",
+                    queue="short",
+                    company_name=company_name,
+                    cache_key=cache_key,
+                )
+            except Exception:
+                release_recompute_lock(cache_key)
+                raise
+        logger.debug(f"Serving stale stats for company {company_name} while refreshing")
+        return entry["stats"]
+    
+    stats = recompute_company_stats(company_name, cache_key, stale_entry=entry)
+    local_cache.set(local_key, stats, scopes=[("company", company_name)])
+    return stats
+
+def recompute_company_stats(company_name, cache_key, stale_entry=None):
+    """Recompute stats under the key's lock, or wait for the worker already doing it"""
+    if acquire_recompute_lock(cache_key):
+        try:
+            return refresh_company_stats(company_name, cache_key, release_lock=False)
+        finally:
+            release_recompute_lock(cache_key)
+    
+    deadline = time.monotonic() + RECOMPUTE_WAIT_SEC
+    while time.monotonic() < deadline:
+        time.sleep(RECOMPUTE_POLL_SEC)
+        entry = frappe.cache().get_value(cache_key, expires=True)
+        if entry and entry["refresh_at"] > time.time():
+            return entry["stats"]
+    
+    # The lock holder did not finish in time; fall back to the stale value or compute directly
+    if stale_entry:
+        return stale_entry["stats"]
+    return calculate_company_stats(company_name)
+
+def refresh_company_stats(company_name, cache_key, release_lock=True):
+    """Calculate stats and store them with a fresh soft TTL (also runs as a background job)"""
+    try:
         stats = calculate_company_stats(company_name)
-        # Cache for 1 hour (3600 seconds)
-        frappe.cache().set_value(cache_key, stats, expires_in_sec=3600)
+        entry = {"stats": stats, "refresh_at": time.time() + COMPANY_STATS_SOFT_TTL}
+        frappe.cache().set_value(cache_key, entry, expires_in_sec=COMPANY_STATS_TTL)
         logger.info(f"Calculated and cached stats for company: {company_name}")
         return stats
+    finally:
+        if release_lock:
+            release_recompute_lock(cache_key)
+
+def get_cached_company_stats_batch(company_names):
+    """Get statistics for many companies with pipelined cache reads
+
+    The in-process tier is checked first, then all generations and all entries
+    are read with one MGET each. Stale entries are served while a refresh is
+    enqueued, and every miss is computed together with one grouped query.
+    """
+    results = {}
+    pending = []
+    for company in company_names:
+        stats = local_cache.get(("company_stats", company))
+        if stats is None:
+            pending.append(company)
+        else:
+            results[company] = stats
     
-    logger.debug(f"Retrieved cached stats for company: {company_name}")
-    return cached_data
+    if not pending:
+        return results
+    
+    cache = frappe.cache()
+    generations = get_generations(("global", None), *(("company", company) for company in pending))
+    global_generation = generations[0]
+    cache_keys = {
+        company: f"company_stats::{company}::g{global_generation}.{generation}"
+        for company, generation in zip(pending, generations[1:], strict=True)
+    }
+    raw_entries = cache.mget([cache.make_key(cache_keys[company]) for company in pending])
+    
+    misses = []
+    now = time.time()
+    for company, raw_entry in zip(pending, raw_entries, strict=True):
+        entry = pickle.loads(raw_entry) if raw_entry else None
+        if not entry:
+            misses.append(company)
+            continue
+        
+        if entry["refresh_at"] <= now and acquire_recompute_lock(cache_keys[company]):
+            try:
+                frappe.enqueue(
+                    "company_management.company_management.utils.cache.refresh_company_stats",
+                    queue="short",
+                    company_name=company,
+                    cache_key=cache_keys[company],
+                )
+            except Exception:
+                release_recompute_lock(cache_keys[company])
+                raise
+        results[company] = entry["stats"]
+        local_cache.set(("company_stats", company), entry["stats"], scopes=[("company", company)])
+    
+    if misses:
+        computed = aggregate_company_stats(misses)
+        pipeline = cache.pipeline()
+        for company, stats in computed.items():
+            entry = {"stats": stats, "refresh_at": now + COMPANY_STATS_SOFT_TTL}
+            pipeline.setex(cache.make_key(cache_keys[company]), COMPANY_STATS_TTL, pickle.dumps(entry))
+            local_cache.set(("company_stats", company), stats, scopes=[("company", company)])
+        pipeline.execute()
+        results.update(computed)
+        logger.info(f"Calculated and cached stats for {len(misses)} companies")
+    
+    return results
 
 def calculate_company_stats(company_name):
     """Calculate company statistics"""
     try:
-        stats = {
-            "departments": frappe.db.count('CM Department', filters={'company': company_name}),
-            "employees": frappe.db.count('CM Employee', filters={'company': company_name}),
-            "projects": frappe.db.count('CM Project', filters={'company': company_name}),
-            "active_projects": frappe.db.count('CM Project', filters={'company': company_name, 'status': ['!=', 'Completed']}),
-            "pending_reviews": frappe.db.count('Performance Review', filters={
-                'workflow_state': ['in', ['Pending Review', 'Review Scheduled', 'Under Approval']]
-            })
-        }
-        
-        # Calculate employee distribution by department
-        employees_by_dept = frappe.db.sql("""
-            SELECT d.department_name, COUNT(e.name) as employee_count
-            FROM `tabCM Department` d 
-            LEFT JOIN `tabCM Employee` e ON d.name = e.department 
-            WHERE d.company = %s 
-            GROUP BY d.name, d.department_name
-        """, (company_name,), as_dict=True)
-        
-        stats["employee_distribution"] = employees_by_dept
-        
-        return stats
+        return aggregate_company_stats([company_name])[company_name]
         
     except Exception as e:
         logger.error(f"Error calculating company stats for {company_name}: {str(e)}")
         return {}
 
+def aggregate_company_stats(company_names):
+    """Calculate statistics for many companies in two aggregate queries
+
+    The first statement joins pre-grouped counts of departments, employees,
+    projects (active ones via SUM(CASE ...)) and pending reviews of each
+    company's employees; the second builds the per-department employee distribution.
+    """
+    stats = {
+        company: {
+            "departments": 0,
+            "employees": 0,
+            "projects": 0,
+            "active_projects": 0,
+            "pending_reviews": 0,
+            "employee_distribution": []
+        }
+        for company in company_names
+    }
+    if not company_names:
+        return stats
+    
+    values = {"companies": list(company_names), "pending_states": PENDING_REVIEW_STATES}
+    
+    counts = frappe.db.sql("""
+        SELECT c.name AS company,
+            IFNULL(d.departments, 0) AS departments,
+            IFNULL(e.employees, 0) AS employees,
+            IFNULL(p.projects, 0) AS projects,
+            IFNULL(p.active_projects, 0) AS active_projects,
+            IFNULL(r.pending_reviews, 0) AS pending_reviews
+        FROM `tabCM Company` c
+        LEFT JOIN (
+            SELECT company, COUNT(*) AS departments
+            FROM `tabCM Department`
+            WHERE company IN %(companies)s
+            GROUP BY company
+        ) d ON d.company = c.name
+        LEFT JOIN (
+            SELECT company, COUNT(*) AS employees
+            FROM `tabCM Employee`
+            WHERE company IN %(companies)s
+            GROUP BY company
+        ) e ON e.company = c.name
+        LEFT JOIN (
+            SELECT company,
+                COUNT(*) AS projects,
+                SUM(CASE WHEN IFNULL(status, '') != 'Completed' THEN 1 ELSE 0 END) AS active_projects
+            FROM `tabCM Project`
+            WHERE company IN %(companies)s
+            GROUP BY company
+        ) p ON p.company = c.name
+        LEFT JOIN (
+            SELECT emp.company, COUNT(*) AS pending_reviews
+            FROM `tabPerformance Review` pr
+            INNER JOIN `tabCM Employee` emp ON emp.name = pr.employee
+            WHERE emp.company IN %(companies)s
+                AND pr.workflow_state IN %(pending_states)s
+            GROUP BY emp.company
+        ) r ON r.company = c.name
+        WHERE c.name IN %(companies)s
+    """, values, as_dict=True)
+    
+    for row in counts:
+        stats[row.company].update({
+            "departments": int(row.departments),
+            "employees": int(row.employees),
+            "projects": int(row.projects),
+            "active_projects": int(row.active_projects),
+            "pending_reviews": int(row.pending_reviews)
+        })
+    
+    # Calculate employee distribution by department
+    employees_by_dept = frappe.db.sql("""
+        SELECT d.company, d.department_name, COUNT(e.name) as employee_count
+        FROM `tabCM Department` d 
+        LEFT JOIN `tabCM Employee` e ON d.name = e.department 
+        WHERE d.company IN %(companies)s 
+        GROUP BY d.company, d.name, d.department_name
+    """, values, as_dict=True)
+    
+    for row in employees_by_dept:
+        stats[row.company]["employee_distribution"].append({
+            "department_name": row.department_name,
+            "employee_count": row.employee_count
+        })
+    
+    return stats
+
 def get_cached_employee_performance(employee_name):
     """Get cached employee performance data"""
-    cache_key = f"employee_performance_{employee_name}"
+    local_key = ("employee_performance", employee_name)
+    cached_data = local_cache.get(local_key)
+    if cached_data is not None:
+        return cached_data
+    
+    cache_key = make_versioned_key("employee_performance", "employee", employee_name)
     cached_data = frappe.cache().get_value(cache_key)
     
     if not cached_data:
         performance_data = calculate_employee_performance(employee_name)
-        # Cache for 30 minutes
-        frappe.cache().set_value(cache_key, performance_data, expires_in_sec=1800)
+        frappe.cache().set_value(cache_key, performance_data, expires_in_sec=EMPLOYEE_PERFORMANCE_TTL)
+        local_cache.set(local_key, performance_data, scopes=[("employee", employee_name)])
         logger.info(f"Calculated and cached performance data for employee: {employee_name}")
         return performance_data
     
     logger.debug(f"Retrieved cached performance data for employee: {employee_name}")
+    local_cache.set(local_key, cached_data, scopes=[("employee", employee_name)])
     return cached_data
 
 def calculate_employee_performance(employee_name):
-    """Calculate employee performance metrics"""
+    """Calculate employee performance metrics
+
+    Counts and averages are aggregated in SQL per review year, so the cached
+    payload holds one compact summary per year instead of every review row.
+    Individual reviews are available through api.performance_review.get_reviews_by_employee.
+    """
     try:
-        # Get all performance reviews for employee
-        reviews = frappe.get_all('Performance Review',
-                               filters={'employee': employee_name},
-                               fields=['overall_rating', 'review_period_end', 'workflow_state'],
-                               order_by='review_period_end desc')
+        reviews_by_year = frappe.db.sql("""
+            SELECT YEAR(review_period_end) AS year,
+                COUNT(*) AS total_reviews,
+                SUM(CASE WHEN rating > 0 THEN 1 ELSE 0 END) AS rated_reviews,
+                SUM(rating) AS rating_sum
+            FROM `tabPerformance Review`
+            WHERE employee = %s
+            GROUP BY YEAR(review_period_end)
+            ORDER BY year DESC
+        """, (employee_name,), as_dict=True)
+        
+        latest_rating = frappe.db.get_value('Performance Review',
+                                            {'employee': employee_name},
+                                            'overall_rating',
+                                            order_by='review_period_end desc')
         
         performance_data = {
-            "total_reviews": len(reviews),
-            "latest_rating": reviews[0].get('overall_rating') if reviews else None,
+            "total_reviews": 0,
+            "latest_rating": latest_rating,
             "reviews_by_year": {},
             "average_rating": 0
         }
         
-        # Calculate average rating and group by year
-        if reviews:
-            rating_sum = 0
-            rating_count = 0
+        rating_sum = 0
+        rating_count = 0
+        for row in reviews_by_year:
+            rated = int(row.rated_reviews or 0)
+            performance_data["total_reviews"] += int(row.total_reviews)
+            rating_sum += int(row.rating_sum or 0)
+            rating_count += rated
             
-            for review in reviews:
-                if review.overall_rating and review.overall_rating.startswith(('1', '2', '3', '4', '5')):
-                    rating_value = int(review.overall_rating[0])
-                    rating_sum += rating_value
-                    rating_count += 1
-                    
-                    # Group by year
-                    year = review.review_period_end.year if review.review_period_end else 'Unknown'
-                    if year not in performance_data["reviews_by_year"]:
-                        performance_data["reviews_by_year"][year] = []
-                    performance_data["reviews_by_year"][year].append(review)
-            
-            if rating_count > 0:
-                performance_data["average_rating"] = round(rating_sum / rating_count, 2)
+            year = row.year or 'Unknown'
+            performance_data["reviews_by_year"][year] = {
+                "total_reviews": int(row.total_reviews),
+                "rated_reviews": rated,
+                "average_rating": round(int(row.rating_sum) / rated, 2) if rated else 0
+            }
+        
+        if rating_count > 0:
+            performance_data["average_rating"] = round(rating_sum / rating_count, 2)
         
         return performance_data
         
@@ -105,59 +462,79 @@ def calculate_employee_performance(employee_name):
         return {}
 
 def clear_cache_for_company(company_name):
-    """Clear all cached data for a company"""
-    cache_keys = [
-        f"company_stats_{company_name}",
-    ]
-    
-    for key in cache_keys:
-        frappe.cache().delete_value(key)
-    
+    """Clear all cached data for a company (stats and dashboards of its users)"""
+    invalidate_scopes([("company", company_name)])
     logger.info(f"Cleared cache for company: {company_name}")
 
 def clear_cache_for_employee(employee_name):
     """Clear cached data for an employee"""
-    cache_key = f"employee_performance_{employee_name}"
-    frappe.cache().delete_value(cache_key)
+    invalidate_scopes([("employee", employee_name)])
     logger.info(f"Cleared cache for employee: {employee_name}")
 
+def invalidate_cache_for_doc(doc, method=None):
+    """Invalidate the stats, performance and dashboard entries affected by a document change (doc event)"""
+    doc_before_save = doc.get_doc_before_save()
+    
+    def current_and_previous(fieldname):
+        values = {doc.get(fieldname)}
+        if doc_before_save:
+            values.add(doc_before_save.get(fieldname))
+        return {value for value in values if value}
+    
+    employees = set()
+    if doc.doctype == "CM Company":
+        companies = {doc.name}
+    elif doc.doctype == "Performance Review":
+        employees = current_and_previous("employee")
+        # Pending review counts in company stats depend on the employee's company
+        companies = set(frappe.get_all("CM Employee",
+                                       filters={"name": ["in", list(employees)]},
+                                       pluck="company")) if employees else set()
+    else:
+        companies = current_and_previous("company")
+    
+    invalidate_scopes([("employee", employee) for employee in employees] +
+                      [("company", company) for company in companies])
+
 def clear_all_company_management_cache():
     """Clear all company management related cache"""
     try:
-        # Get all cache keys related to company management
-        cache = frappe.cache()
-        
-        # This is a simplified approach - in production you'd want a more sophisticated cache key management
-        companies = frappe.get_all('CM Company', pluck='name')
-        employees = frappe.get_all('CM Employee', pluck='name')
-        
-        for company in companies:
-            clear_cache_for_company(company)
-            
-        for employee in employees:
-            clear_cache_for_employee(employee)
-            
+        bump_generation("global")
         logger.info("Cleared all company management cache")
         
     except Exception as e:
         logger.error(f"Error clearing cache: {str(e)}")
 
 def get_dashboard_cache_key(user, dashboard_type):
-    """Generate cache key for dashboard data"""
-    return f"dashboard_{dashboard_type}_{user}_{frappe.utils.today()}"
+    """Generate cache key for dashboard data, versioned by the user's company"""
+    company = get_user_context(user).company
+    return make_versioned_key(f"dashboard_{dashboard_type}_{frappe.utils.today()}", "company", company) + f"::{user}"
+
+def get_dashboard_local_key(user, dashboard_type):
+    """Key and invalidation scopes of dashboard data in the in-process tier"""
+    company = get_user_context(user).company
+    return ("dashboard", dashboard_type, user, frappe.utils.today()), [("company", company)]
 
 def cache_dashboard_data(user, dashboard_type, data, expires_in_minutes=15):
     """Cache dashboard data"""
     cache_key = get_dashboard_cache_key(user, dashboard_type)
     frappe.cache().set_value(cache_key, data, expires_in_sec=expires_in_minutes * 60)
+    local_key, scopes = get_dashboard_local_key(user, dashboard_type)
+    local_cache.set(local_key, data, scopes=scopes)
     logger.debug(f"Cached dashboard data: {cache_key}")
 
 def get_cached_dashboard_data(user, dashboard_type):
     """Get cached dashboard data"""
+    local_key, scopes = get_dashboard_local_key(user, dashboard_type)
+    cached_data = local_cache.get(local_key)
+    if cached_data is not None:
+        return cached_data
+    
     cache_key = get_dashboard_cache_key(user, dashboard_type)
     cached_data = frappe.cache().get_value(cache_key)
     
     if cached_data:
         logger.debug(f"Retrieved cached dashboard data: {cache_key}")
+        local_cache.set(local_key, cached_data, scopes=scopes)
     
     return cached_data
\ No newline at end of file
@@ -0,0 +1,193 @@
+from contextlib import contextmanager
+
+import frappe
+from company_management.company_management.utils.logging_config import log_system_event
+
+# Counter fields on each parent doctype and the (child doctype, link field) they count
+COUNTER_DEFINITIONS = {
+    "CM Company": {
+        "number_of_departments": ("CM Department", "company"),
+        "number_of_employees": ("CM Employee", "company"),
+        "number_of_projects": ("CM Project", "company"),
+    },
+    "CM Department": {
+        "number_of_employees": ("CM Employee", "department"),
+        "number_of_projects": ("CM Project", "department"),
+    },
+}
+
+# Above this many dirty parents the recount runs in a background job instead of at commit
+RECOUNT_ENQUEUE_THRESHOLD = 500
+
+@contextmanager
+def defer_counter_updates():
+    """Coalesce counter maintenance for bulk work into one recount per parent at commit
+
+    Usage:
+        with defer_counter_updates():
+            for row in rows:
+                frappe.get_doc(row).insert()
+    """
+    previous = frappe.flags.defer_counter_updates
+    frappe.flags.defer_counter_updates = True
+    try:
+        yield
+    finally:
+        frappe.flags.defer_counter_updates = previous
+
+def counters_deferred():
+    """Check whether counter updates should be queued instead of applied immediately"""
+    return bool(frappe.flags.defer_counter_updates or frappe.flags.in_import)
+
+def mark_dirty(doctype, name):
+    """Record a parent whose counters must be recounted before the transaction commits"""
+    if not name:
+        return
+
+    dirty = getattr(frappe.local, "cm_dirty_counter_parents", None)
+    if dirty is None:
+        dirty = frappe.local.cm_dirty_counter_parents = set()
+        frappe.db.before_commit.add(flush_dirty_counters)
+        frappe.db.after_rollback.add(discard_dirty_counters)
+
+    dirty.add((doctype, name))
+
+def discard_dirty_counters():
+    """Forget queued recounts when the transaction is rolled back"""
+    frappe.local.cm_dirty_counter_parents = None
+
+def flush_dirty_counters():
+    """Run one deduplicated recount per dirty parent"""
+    dirty = getattr(frappe.local, "cm_dirty_counter_parents", None)
+    frappe.local.cm_dirty_counter_parents = None
+    if not dirty:
+        return
+
+    parents = sorted(dirty)
+    if len(parents) > RECOUNT_ENQUEUE_THRESHOLD:
+        frappe.enqueue(
+            "company_management.company_management.utils.counters.recount_parents",
+            queue="long",
+            parents=parents,
+            enqueue_after_commit=True,
+        )
+    else:
+        recount_parents(parents)
+
+def recount_parents(parents):
+    """Recompute counters for the given (doctype, name) pairs, one statement per doctype"""
+    names_by_doctype = {}
+    for doctype, name in parents:
+        names_by_doctype.setdefault(doctype, []).append(name)
+
+    for doctype, names in names_by_doctype.items():
+        assignments = ", ".join(
+            f"`{field}` = (SELECT COUNT(*) FROM `tab{child}` c WHERE c.`{link_field}` = p.name)"
+            for field, (child, link_field) in COUNTER_DEFINITIONS[doctype].items()
+        )
+        frappe.db.sql(f"""
+            UPDATE `tab{doctype}` p
+            SET {assignments}
+            WHERE p.name IN %(names)s
+        """, {"names": names})
+
+def adjust_counter(doctype, name, field, delta):
+    """Atomically add `delta` to a counter field without loading or saving the document"""
+    if not name or not delta:
+        return
+
+    table = f"tab{doctype}"
+    frappe.db.sql(f"""
+        UPDATE `{table}`
+        SET `{field}` = GREATEST(IFNULL(`{field}`, 0) + %(delta)s, 0)
+        WHERE name = %(name)s
+    """, {"delta": delta, "name": name})
+
+def update_parent_counters(doc, field, parents, delta=None):
+    """Maintain `field` on each parent link of `doc` with +1/-1 updates
+
+    `parents` maps the link fieldname on `doc` to the parent doctype, e.g.
+    {"department": "CM Department", "company": "CM Company"}. With an explicit
+    `delta` (+1 on insert, -1 on trash) every current parent is adjusted. Without
+    it, the document is compared against its state before save and only
+    re-parented links move the count from the old parent to the new one.
+    While counters are deferred, affected parents are queued for a single
+    recount at commit instead.
+    """
+    if delta is not None:
+        for link_field, parent_doctype in parents.items():
+            if counters_deferred():
+                mark_dirty(parent_doctype, doc.get(link_field))
+            else:
+                adjust_counter(parent_doctype, doc.get(link_field), field, delta)
+        return
+
+    doc_before_save = doc.get_doc_before_save()
+    if not doc_before_save:
+        return
+
+    for link_field, parent_doctype in parents.items():
+        old_parent = doc_before_save.get(link_field)
+        new_parent = doc.get(link_field)
+        if old_parent == new_parent:
+            continue
+        if counters_deferred():
+            mark_dirty(parent_doctype, old_parent)
+            mark_dirty(parent_doctype, new_parent)
+        else:
+            adjust_counter(parent_doctype, old_parent, field, -1)
+            adjust_counter(parent_doctype, new_parent, field, 1)
+
+def reconcile_counters(chunk_size=1000):
+    """Repair drifted number_of_* counters on every company and department
+
+    Parents are processed in name-ordered chunks. Each chunk costs one grouped
+    COUNT per child doctype, served by the indexed company / department links,
+    and only rows whose stored value differs are written.
+    Returns a drift summary per parent doctype.
+    """
+    summary = {}
+
+    for doctype, counters in COUNTER_DEFINITIONS.items():
+        doctype_summary = summary[doctype] = {"checked": 0, "drifted": 0, "fields": {}}
+        last_name = None
+
+        while True:
+            filters = {"name": [">", last_name]} if last_name else None
+            parents = frappe.get_all(doctype,
+                                     filters=filters,
+                                     fields=["name", *counters],
+                                     order_by="name asc",
+                                     limit_page_length=chunk_size)
+            if not parents:
+                break
+
+            names = [parent.name for parent in parents]
+            actual = {}
+            for field, (child, link_field) in counters.items():
+                actual[field] = dict(frappe.db.sql(f"""
+                    SELECT `{link_field}`, COUNT(*)
+                    FROM `tab{child}`
+                    WHERE `{link_field}` IN %(names)s
+                    GROUP BY `{link_field}`
+                """, {"names": names}))
+
+            for parent in parents:
+                changes = {}
+                for field in counters:
+                    expected = actual[field].get(parent.name, 0)
+                    if (parent.get(field) or 0) != expected:
+                        changes[field] = expected
+                        doctype_summary["fields"][field] = doctype_summary["fields"].get(field, 0) + 1
+
+                if changes:
+                    frappe.db.set_value(doctype, parent.name, changes, update_modified=False)
+                    doctype_summary["drifted"] += 1
+
+            doctype_summary["checked"] += len(parents)
+            last_name = names[-1]
+            frappe.db.commit()
+
+    drifted = sum(doctype_summary["drifted"] for doctype_summary in summary.values())
+    log_system_event("Counter reconciliation", f"{drifted} drifted rows repaired - {summary}")
+    return summary
@@ -0,0 +1,82 @@
+import base64
+import json
+
+import frappe
+from frappe.utils import cint
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def get_page_size(page_size=None):
+    """Clamp the requested page size to the allowed range"""
+    page_size = cint(page_size) or DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+def encode_cursor(row, sort_field="modified"):
+    """Build an opaque cursor from the (sort value, name) of the last row of a page"""
+    payload = json.dumps([str(row.get(sort_field)), row.get("name")])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor into (sort value, name)"""
+    try:
+        value, name = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        frappe.throw("Invalid pagination cursor")
+    return value, name
+
+def get_keyset_conditions(cursor, sort_field="modified"):
+    """Return (filters, or_filters) selecting rows strictly after the cursor
+
+    Rows are ordered by `sort_field desc, name desc`, so "after" means
+    value < v OR (value = v AND name < n), expressed here as
+    value <= v AND (value < v OR name < n) to fit frappe's filter model.
+    """
+    value, name = decode_cursor(cursor)
+    filters = [[sort_field, "<=", value]]
+    or_filters = [[sort_field, "<", value], ["name", "<", name]]
+    return filters, or_filters
+
+def paginate(doctype, filters=None, fields=None, cursor=None, page_size=None, method=None, sort_field="modified"):
+    """Fetch one page of `doctype` using keyset pagination
+
+    Rows are ordered by `sort_field desc, name desc`; `sort_field` must be a
+    non-null column. Returns (rows, next_cursor); next_cursor is None on the last page.
+    Every page is a single indexed range scan, so deep pages cost the same as the first one.
+    """
+    page_size = get_page_size(page_size)
+    fields = list(fields or ["name"])
+    for field in ("name", sort_field):
+        if field not in fields:
+            fields.append(field)
+
+    conditions = []
+    if isinstance(filters, dict):
+        conditions = [[key, *value] if isinstance(value, (list, tuple)) else [key, "=", value]
+                      for key, value in filters.items()]
+    elif filters:
+        conditions = list(filters)
+
+    or_filters = None
+    if cursor:
+        keyset_filters, or_filters = get_keyset_conditions(cursor, sort_field)
+        conditions.extend(keyset_filters)
+
+    fetch = method or frappe.get_all
+    rows = fetch(doctype,
+                 filters=conditions,
+                 or_filters=or_filters,
+                 fields=fields,
+                 order_by=f"{sort_field} desc, name desc",
+                 limit_page_length=page_size + 1)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1], sort_field)
+
+    return rows, next_cursor
+
+def paginated_response(rows, next_cursor):
+    """Standard response envelope for paginated list endpoints"""
+    return {"success": True, "data": rows, "next_cursor": next_cursor}
@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+
+import frappe
+
+def run_after_commit(callback):
+    """Run `callback` once the transaction commits
+
+    Inside a `savepoint` block the callback is held back until the block
+    succeeds, so work rolled back to the savepoint never triggers it.
+    """
+    pending = getattr(frappe.local, "cm_savepoint_callbacks", None)
+    if pending is not None:
+        pending.append(callback)
+    else:
+        frappe.db.after_commit.add(callback)
+
+@contextmanager
+def savepoint(name):
+    """Savepoint that rolls back on error and drops the after-commit callbacks registered inside it"""
+    previous = getattr(frappe.local, "cm_savepoint_callbacks", None)
+    callbacks = frappe.local.cm_savepoint_callbacks = []
+    frappe.db.savepoint(name)
+    try:
+        yield
+    except Exception:
+        frappe.db.rollback(save_point=name)
+        raise
+    finally:
+        frappe.local.cm_savepoint_callbacks = previous
+    
+    # Released: hand the callbacks to the enclosing savepoint or the transaction
+    for callback in callbacks:
+        run_after_commit(callback)
\ No newline at end of file
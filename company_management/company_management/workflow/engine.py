@@ -0,0 +1,89 @@
+import frappe
+from frappe.utils import cint
+from company_management.company_management.utils.cache import local_cache
+from company_management.company_management.workflow.performance_review_workflow import (
+    WORKFLOW_STATES,
+    WORKFLOW_TRANSITIONS,
+)
+
+TRANSITION_TABLE_CACHE_KEY = "cm_workflow_transition_table"
+
+def compile_transition_table(states, transitions):
+    """Compile workflow states and transitions into {(state, action): transition}
+
+    Each transition carries its next state, the set of roles allowed to perform
+    it (rows for the same state and action are merged) and the docstatus of the
+    next state.
+    """
+    doc_status = {state["state"]: cint(state["doc_status"]) for state in states}
+    table = {}
+
+    for transition in transitions:
+        allowed = transition["allowed"]
+        roles = {allowed} if isinstance(allowed, str) else set(allowed)
+        key = (transition["state"], transition["action"])
+
+        if key in table:
+            roles |= table[key].roles
+        table[key] = frappe._dict(
+            next_state=transition["next_state"],
+            roles=frozenset(roles),
+            doc_status=doc_status.get(transition["next_state"], 0),
+        )
+
+    return table
+
+def load_transition_table(document_type):
+    """Compile the active Workflow of `document_type`, falling back to the built-in definition"""
+    workflow_name = frappe.db.get_value("Workflow", {"document_type": document_type, "is_active": 1}, "name")
+    if workflow_name:
+        workflow = frappe.get_doc("Workflow", workflow_name)
+        return compile_transition_table([state.as_dict() for state in workflow.states],
+                                        [transition.as_dict() for transition in workflow.transitions])
+
+    return compile_transition_table(WORKFLOW_STATES, WORKFLOW_TRANSITIONS)
+
+def get_transition_table(document_type="Performance Review"):
+    """Get the compiled transition table from the worker cache, Redis, or the Workflow doc"""
+    local_key = ("workflow_transition_table", document_type)
+    table = local_cache.get(local_key)
+    if table is not None:
+        return table
+
+    table = frappe.cache().hget(TRANSITION_TABLE_CACHE_KEY, document_type)
+    if table is None:
+        table = load_transition_table(document_type)
+        frappe.cache().hset(TRANSITION_TABLE_CACHE_KEY, document_type, table)
+
+    local_cache.set(local_key, table, scopes=[("workflow", None)])
+    return table
+
+def clear_transition_table(doc=None, method=None):
+    """Invalidate compiled transition tables (Workflow doc event and clear_cache hook)"""
+    local_cache.invalidate("workflow")
+    frappe.cache().delete_value(TRANSITION_TABLE_CACHE_KEY)
+
+def get_transition(state, action, document_type="Performance Review"):
+    """Transition for `action` from `state`, or None if the action is not valid there"""
+    return get_transition_table(document_type).get((state, action))
+
+def get_allowed_actions(state, roles=None, document_type="Performance Review"):
+    """Actions the given roles (default: session user's roles) can perform from `state`"""
+    roles = set(roles if roles is not None else frappe.get_roles())
+    return [action for (from_state, action), transition in get_transition_table(document_type).items()
+            if from_state == state and transition.roles & roles]
+
+def apply_transition(doc, transition):
+    """Move `doc` along a validated transition, submitting it when the next state requires it"""
+    frappe.flags.in_workflow_action = True
+    try:
+        doc.workflow_state = transition.next_state
+        if transition.doc_status == 1 and doc.docstatus == 0:
+            doc.submit()
+        elif transition.doc_status == 2 and doc.docstatus == 1:
+            doc.cancel()
+        else:
+            doc.save()
+        return doc
+    finally:
+        frappe.flags.in_workflow_action = False
@@ -0,0 +1,101 @@
+import frappe
+from company_management.company_management.utils.cache import PENDING_REVIEW_STATES
+from company_management.company_management.utils.transactions import run_after_commit
+
+INBOX_COUNTS_KEY_PREFIX = "cm_reviewer_inbox"
+INBOX_COUNTS_TTL = 15 * 60
+
+# States counted in a reviewer's inbox
+INBOX_STATES = PENDING_REVIEW_STATES
+
+# Counters are raw Redis hashes ({state: count}) so they can be changed with HINCRBY.
+# A counter is only adjusted while its hash exists; a missing hash is rebuilt from
+# the database on the next read. Changes committed while a rebuild is in flight can
+# be missed, so counts are badge hints only (inbox pages always query the database)
+# and drift is bounded by the short INBOX_COUNTS_TTL.
+INCREMENT_IF_EXISTS = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('hincrby', KEYS[1], ARGV[1], ARGV[2])
+end
+return nil
+"""
+
+def get_inbox_key(reviewer):
+    return frappe.cache().make_key(f"{INBOX_COUNTS_KEY_PREFIX}::{reviewer}")
+
+def get_inbox_counts(reviewer):
+    """Pending review counts of `reviewer` per inbox state, from Redis or the database"""
+    # Read through a pipeline: the cache wrapper's hgetall expects pickled values
+    pipeline = frappe.cache().pipeline()
+    pipeline.hgetall(get_inbox_key(reviewer))
+    (cached,) = pipeline.execute()
+    if cached:
+        return {state: int(cached.get(state.encode(), 0)) for state in INBOX_STATES}
+
+    return load_inbox_counts(reviewer)
+
+def load_inbox_counts(reviewer):
+    """Count `reviewer`'s pending reviews with one grouped query and store them in Redis"""
+    counts = dict.fromkeys(INBOX_STATES, 0)
+    counts.update(frappe.db.sql("""
+        SELECT workflow_state, COUNT(*)
+        FROM `tabPerformance Review`
+        WHERE reviewer = %(reviewer)s
+            AND workflow_state IN %(states)s
+            AND docstatus < 2
+        GROUP BY workflow_state
+    """, {"reviewer": reviewer, "states": INBOX_STATES}))
+
+    key = get_inbox_key(reviewer)
+    pipeline = frappe.cache().pipeline()
+    pipeline.delete(key)
+    pipeline.hset(key, mapping=counts)
+    pipeline.expire(key, INBOX_COUNTS_TTL)
+    pipeline.execute()
+    return counts
+
+def clear_inbox_counts(reviewers):
+    """Drop the counters of `reviewers` so they are rebuilt on next read"""
+    keys = [get_inbox_key(reviewer) for reviewer in set(reviewers) if reviewer]
+    if keys:
+        frappe.cache().delete_value(keys, make_keys=False)
+
+def get_inbox_changes(old, new):
+    """Counter changes [(reviewer, state, delta)] for a review moving from `old` to `new`
+
+    `old` and `new` are (reviewer, workflow_state) pairs, or None when the review
+    did not exist (or was cancelled / deleted) on that side.
+    """
+    if old == new:
+        return []
+
+    changes = []
+    if old and old[0] and old[1] in INBOX_STATES:
+        changes.append((old[0], old[1], -1))
+    if new and new[0] and new[1] in INBOX_STATES:
+        changes.append((new[0], new[1], 1))
+    return changes
+
+def update_inbox_counts(doc, method=None):
+    """Adjust reviewer inbox counters after a Performance Review changes (doc event)
+
+    Counters are adjusted once the transaction commits, so rolled-back transitions
+    never reach them.
+    """
+    doc_before_save = doc.get_doc_before_save()
+    if method == "on_trash":
+        old, new = (doc.reviewer, doc.workflow_state), None
+    else:
+        old = None
+        if doc_before_save and doc_before_save.docstatus < 2:
+            old = (doc_before_save.reviewer, doc_before_save.workflow_state)
+        new = (doc.reviewer, doc.workflow_state) if doc.docstatus < 2 else None
+
+    changes = get_inbox_changes(old, new)
+    if changes:
+        run_after_commit(lambda: apply_inbox_changes(changes))
+
+def apply_inbox_changes(changes):
+    cache = frappe.cache()
+    for reviewer, state, delta in changes:
+        cache.eval(INCREMENT_IF_EXISTS, 1, get_inbox_key(reviewer), state, delta)
\ No newline at end of file
@@ -0,0 +1,131 @@
+import json
+
+import frappe
+from company_management.company_management.utils.logging_config import log_system_event
+from company_management.company_management.utils.transactions import run_after_commit
+
+NOTIFICATION_QUEUE_KEY = "cm_review_notification_queue"
+
+# Who is told about a review entering each state: review link fields, or "approvers"
+# for the Company Admins of the reviewed employee's company
+STATE_RECIPIENTS = {
+    "Review Scheduled": ["employee"],
+    "Feedback Provided": ["employee"],
+    "Under Approval": ["approvers"],
+    "Review Approved": ["employee", "reviewer"],
+    "Review Rejected": ["reviewer"],
+}
+
+# Reviews listed by name in one digest email; the rest are only counted
+DIGEST_MAX_LISTED_REVIEWS = 20
+
+def queue_transition_event(doc, method=None):
+    """Queue a workflow transition for the next digest (Performance Review doc event)
+
+    Nothing is sent on the save path; the event is pushed to Redis only once the
+    transaction commits, so rolled-back transitions are never announced.
+    """
+    doc_before_save = doc.get_doc_before_save()
+    old_state = doc_before_save.workflow_state if doc_before_save else None
+    if doc.workflow_state == old_state or doc.workflow_state not in STATE_RECIPIENTS:
+        return
+
+    event = json.dumps({
+        "review": doc.name,
+        "state": doc.workflow_state,
+        "employee": doc.employee,
+        "reviewer": doc.reviewer
+    })
+    # rpush prefixes the key itself, matching the make_key used by the drain pipeline
+    run_after_commit(lambda: frappe.cache().rpush(NOTIFICATION_QUEUE_KEY, event))
+
+def drain_notification_queue():
+    """Atomically take every queued transition event"""
+    cache = frappe.cache()
+    key = cache.make_key(NOTIFICATION_QUEUE_KEY)
+    pipeline = cache.pipeline()
+    pipeline.lrange(key, 0, -1)
+    pipeline.delete(key)
+    raw_events, _ = pipeline.execute()
+    return [json.loads(raw_event) for raw_event in raw_events]
+
+def send_notification_digests():
+    """Send one digest email per recipient for all queued review transitions (scheduled job)"""
+    events = drain_notification_queue()
+    if not events:
+        return
+
+    digests = get_digests(events)
+    for recipient, reviews_by_state in digests.items():
+        frappe.sendmail(recipients=[recipient],
+                        subject=get_digest_subject(reviews_by_state),
+                        message=get_digest_message(reviews_by_state),
+                        now=False)
+
+    log_system_event("Review notification digests sent",
+                     f"{len(events)} transitions, {len(digests)} recipients")
+
+def get_digests(events):
+    """Group transition events per recipient email: {recipient: {state: [review names]}}"""
+    employees = {event["employee"] for event in events} | {event["reviewer"] for event in events}
+    employee_details = {
+        row.name: row
+        for row in frappe.get_all("CM Employee",
+                                  filters={"name": ["in", list(employees)]},
+                                  fields=["name", "email_address", "company"])
+    }
+    approvers = get_company_approvers({
+        employee_details[event["employee"]].company
+        for event in events if event["employee"] in employee_details
+    })
+
+    digests = {}
+    for event in events:
+        recipients = set()
+        for recipient_field in STATE_RECIPIENTS.get(event["state"], []):
+            if recipient_field == "approvers":
+                employee = employee_details.get(event["employee"])
+                recipients.update(approvers.get(employee.company, []) if employee else [])
+            else:
+                employee = employee_details.get(event[recipient_field])
+                if employee and employee.email_address:
+                    recipients.add(employee.email_address)
+
+        for recipient in recipients:
+            reviews = digests.setdefault(recipient, {}).setdefault(event["state"], [])
+            if event["review"] not in reviews:
+                reviews.append(event["review"])
+
+    return digests
+
+def get_company_approvers(companies):
+    """Emails of active Company Admin user accounts, per company"""
+    approvers = {}
+    if not companies:
+        return approvers
+
+    for account in frappe.get_all("User Account",
+                                  filters={"company": ["in", list(companies)],
+                                           "role": "Company Admin",
+                                           "is_active": 1},
+                                  fields=["company", "email_address"]):
+        approvers.setdefault(account.company, []).append(account.email_address)
+    return approvers
+
+def get_digest_subject(reviews_by_state):
+    total = sum(len(reviews) for reviews in reviews_by_state.values())
+    if list(reviews_by_state) == ["Under Approval"]:
+        return f"You have {total} performance reviews awaiting approval"
+    return f"Performance review updates: {total} reviews"
+
+def get_digest_message(reviews_by_state):
+    sections = []
+    for state, reviews in reviews_by_state.items():
+        listed = "".join(f"<li>{frappe.utils.escape_html(review)}</li>"
+                         for review in reviews[:DIGEST_MAX_LISTED_REVIEWS])
+        more = len(reviews) - DIGEST_MAX_LISTED_REVIEWS
+        if more > 0:
+            listed += f"<li>... and {more} more</li>"
+        sections.append(f"<p><strong>{state}</strong>: {len(reviews)} reviews</p><ul>{listed}</ul>")
+
+    return "".join(sections)
@@ -1,8 +1,91 @@
 import frappe
 
+WORKFLOW_NAME = "Employee Performance Review Cycle"
+
+# Workflow states according to requirements
+WORKFLOW_STATES = [
+    {
+        "state": "Pending Review",
+        "doc_status": "0",
+        "allow_edit": "System Manager",
+        "style": "Warning"
+    },
+    {
+        "state": "Review Scheduled", 
+        "doc_status": "0",
+        "allow_edit": "System Manager",
+        "style": "Info"
+    },
+    {
+        "state": "Feedback Provided",
+        "doc_status": "0", 
+        "allow_edit": "System Manager",
+        "style": "Primary"
+    },
+    {
+        "state": "Under Approval",
+        "doc_status": "0",
+        "allow_edit": "System Manager",
+        "style": "Warning"
+    },
+    {
+        "state": "Review Approved",
+        "doc_status": "1",
+        "allow_edit": "System Manager",
+        "style": "Success"
+    },
+    {
+        "state": "Review Rejected",
+        "doc_status": "0",
+        "allow_edit": "System Manager", 
+        "style": "Danger"
+    }
+]
+
+# Workflow transitions according to requirements, with the roles allowed to perform each
+# action. This is the single source of truth for the Workflow doc and the workflow engine.
+WORKFLOW_TRANSITIONS = [
+    {
+        "state": "Pending Review",
+        "action": "Schedule Review",
+        "next_state": "Review Scheduled",
+        "allowed": ["Department Manager", "Company Admin", "System Manager"]
+    },
+    {
+        "state": "Review Scheduled", 
+        "action": "Provide Feedback",
+        "next_state": "Feedback Provided",
+        "allowed": ["Department Manager", "Company Admin", "System Manager"]
+    },
+    {
+        "state": "Feedback Provided",
+        "action": "Submit for Approval", 
+        "next_state": "Under Approval",
+        "allowed": ["Department Manager", "System Manager"]
+    },
+    {
+        "state": "Under Approval",
+        "action": "Approve Review",
+        "next_state": "Review Approved", 
+        "allowed": ["Company Admin", "System Manager"]
+    },
+    {
+        "state": "Under Approval",
+        "action": "Reject Review",
+        "next_state": "Review Rejected",
+        "allowed": ["Company Admin", "System Manager"]
+    },
+    {
+        "state": "Review Rejected",
+        "action": "Update Feedback",
+        "next_state": "Feedback Provided",
+        "allowed": ["Department Manager", "System Manager"]
+    }
+]
+
 def create_employee_performance_review_workflow():
     """Create the Employee Performance Review Cycle workflow with exact requirements"""
-    workflow_name = "Employee Performance Review Cycle"
+    workflow_name = WORKFLOW_NAME
     
     try:
         # Delete existing workflow if it exists
@@ -16,107 +99,15 @@ def create_employee_performance_review_workflow():
         workflow.document_type = "Performance Review"
         workflow.workflow_state_field = "workflow_state"
         workflow.is_active = 1
-        workflow.send_email_alert = 1
-        
-        # Define workflow states according to requirements
-        workflow_states = [
-            {
-                "state": "Pending Review",
-                "doc_status": "0",
-                "allow_edit": "System Manager",
-                "style": "Warning"
-            },
-            {
-                "state": "Review Scheduled", 
-                "doc_status": "0",
-                "allow_edit": "System Manager",
-                "style": "Info"
-            },
-            {
-                "state": "Feedback Provided",
-                "doc_status": "0", 
-                "allow_edit": "System Manager",
-                "style": "Primary"
-            },
-            {
-                "state": "Under Approval",
-                "doc_status": "0",
-                "allow_edit": "System Manager",
-                "style": "Warning"
-            },
-            {
-                "state": "Review Approved",
-                "doc_status": "1",
-                "allow_edit": "System Manager",
-                "style": "Success"
-            },
-            {
-                "state": "Review Rejected",
-                "doc_status": "0",
-                "allow_edit": "System Manager", 
-                "style": "Danger"
-            }
-        ]
+        # Transition emails are batched by workflow.notifications instead
+        workflow.send_email_alert = 0
         
         # Add states to workflow
-        for state in workflow_states:
+        for state in WORKFLOW_STATES:
             workflow.append("states", state)
         
-        # Define workflow transitions according to requirements
-        workflow_transitions = [
-            {
-                "state": "Pending Review",
-                "action": "Schedule Review",
-                "next_state": "Review Scheduled",
-                "allowed": "System Manager",
-                "condition": "",
-                "allow_self_approval": 0
-            },
-            {
-                "state": "Review Scheduled", 
-                "action": "Provide Feedback",
-                "next_state": "Feedback Provided",
-                "allowed": "System Manager",
-                "condition": "",
-                "allow_self_approval": 0
-            },
-            {
-                "state": "Feedback Provided",
-                "action": "Submit for Approval", 
-                "next_state": "Under Approval",
-                "allowed": "System Manager",
-                "condition": "",
-                "allow_self_approval": 0
-            },
-            {
-                "state": "Under Approval",
-                "action": "Approve Review",
-                "next_state": "Review Approved", 
-                "allowed": "System Manager",
-                "condition": "",
-                "allow_self_approval": 0
-            },
-            {
-                "state": "Under Approval",
-                "action": "Reject Review",
-                "next_state": "Review Rejected",
-                "allowed": "System Manager", 
-                "condition": "",
-                "allow_self_approval": 0
-            },
-            {
-                "state": "Review Rejected",
-                "action": "Update Feedback",
-                "next_state": "Feedback Provided",
-                "allowed": "System Manager",
-                "condition": "",
-                "allow_self_approval": 0
-            }
-        ]
-        
-        # Add transitions to workflow
-        for transition in workflow_transitions:
-            workflow.append("transitions", transition)
+        # Add transitions to workflow, one row per allowed role
+        set_workflow_transitions(workflow)
         
         # Insert the workflow
         workflow.insert()
@@ -130,58 +121,33 @@ def create_employee_performance_review_workflow():
         frappe.log_error(f"Workflow Creation Error: {str(e)}")
         return None
 
+def set_workflow_transitions(workflow):
+    """Replace the transitions of `workflow` with WORKFLOW_TRANSITIONS, one row per allowed role"""
+    workflow.set("transitions", [])
+    for transition in WORKFLOW_TRANSITIONS:
+        for role in transition["allowed"]:
+            workflow.append("transitions", {
+                "state": transition["state"],
+                "action": transition["action"],
+                "next_state": transition["next_state"],
+                "allowed": role,
+                "condition": "",
+                "allow_self_approval": 0
+            })
+
+# Subjects of the per-transition Notifications created by earlier versions
+LEGACY_NOTIFICATION_SUBJECTS = [
+    "Performance Review Scheduled",
+    "Performance Review Feedback Provided",
+    "Performance Review Approved",
+    "Performance Review Rejected"
+]
+
 def setup_workflow_notifications():
-    """Setup email notifications for workflow transitions"""
-    notifications = [
-        {
-            "subject": "Performance Review Scheduled",
-            "document_type": "Performance Review",
-            "event": "Value Change",
-            "value_changed": "workflow_state",
-            "condition": "doc.workflow_state == 'Review Scheduled'",
-            "recipients": [
-                {"receiver_by_document_field": "employee"}
-            ],
-            "message": "Your performance review has been scheduled."
-        },
-        {
-            "subject": "Performance Review Feedback Provided",
-            "document_type": "Performance Review", 
-            "event": "Value Change",
-            "value_changed": "workflow_state",
-            "condition": "doc.workflow_state == 'Feedback Provided'",
-            "recipients": [
-                {"receiver_by_document_field": "employee"}
-            ],
-            "message": "Feedback has been provided for your performance review."
-        },
-        {
-            "subject": "Performance Review Approved",
-            "document_type": "Performance Review",
-            "event": "Value Change", 
-            "value_changed": "workflow_state",
-            "condition": "doc.workflow_state == 'Review Approved'",
-            "recipients": [
-                {"receiver_by_document_field": "employee"},
-                {"receiver_by_document_field": "reviewer"}
-            ],
-            "message": "Performance review has been approved."
-        },
-        {
-            "subject": "Performance Review Rejected",
-            "document_type": "Performance Review",
-            "event": "Value Change",
-            "value_changed": "workflow_state", 
-            "condition": "doc.workflow_state == 'Review Rejected'",
-            "recipients": [
-                {"receiver_by_document_field": "reviewer"}
-            ],
-            "message": "Performance review has been rejected and needs revision."
-        }
-    ]
-    
-    for notification_data in notifications:
-        if not frappe.db.exists("Notification", {"subject": notification_data["subject"]}):
-            notification = frappe.new_doc("Notification")
-            notification.update(notification_data)
-            notification.insert()
\ No newline at end of file
+    """Disable per-transition emails; transitions are sent as periodic digests instead"""
+    for name in frappe.get_all("Notification",
+                               filters={"document_type": "Performance Review",
+                                        "subject": ["in", LEGACY_NOTIFICATION_SUBJECTS],
+                                        "enabled": 1},
+                               pluck="name"):
+        frappe.db.set_value("Notification", name, "enabled", 0)
\ No newline at end of file
@@ -0,0 +1,106 @@
+import json
+
+import frappe
+from frappe.model.naming import parse_naming_series
+from frappe.utils import now
+from company_management.company_management.utils.cache import clear_cache_for_company, invalidate_scopes
+from company_management.company_management.utils.logging_config import log_system_event
+from company_management.company_management.workflow.inbox import clear_inbox_counts
+
+REVIEW_NAMING_SERIES = "PR-.YYYY.-"
+REVIEW_CYCLE_CHUNK_SIZE = 500
+
+def generate_review_cycle(company, review_period_start, review_period_end, department=None):
+    """Create Pending Review documents for every Active employee of a company (or department)
+
+    Runs as a background job. Employees are processed in name-ordered chunks with
+    one bulk insert and one commit per chunk. Employees that already have a review
+    for the period are skipped, so relaunching a cycle never creates duplicates.
+    The reviewer is the employee's manager; employees without one are skipped.
+    """
+    filters = {"company": company, "status": "Active"}
+    if department:
+        filters["department"] = department
+
+    total = frappe.db.count("CM Employee", filters=filters)
+    summary = {"total": total, "created": 0, "skipped_existing": 0, "skipped_no_manager": 0}
+    processed = 0
+    last_name = None
+
+    while True:
+        chunk_filters = dict(filters)
+        if last_name:
+            chunk_filters["name"] = [">", last_name]
+
+        employees = frappe.get_all("CM Employee",
+                                   filters=chunk_filters,
+                                   fields=["name", "manager"],
+                                   order_by="name asc",
+                                   limit_page_length=REVIEW_CYCLE_CHUNK_SIZE)
+        if not employees:
+            break
+        last_name = employees[-1].name
+
+        existing = set(frappe.get_all("Performance Review",
+                                      filters={
+                                          "employee": ["in", [employee.name for employee in employees]],
+                                          "review_period_start": review_period_start,
+                                          "review_period_end": review_period_end,
+                                          "docstatus": ["<", 2]
+                                      },
+                                      pluck="employee"))
+
+        to_create = []
+        for employee in employees:
+            if employee.name in existing:
+                summary["skipped_existing"] += 1
+            elif not employee.manager:
+                summary["skipped_no_manager"] += 1
+            else:
+                to_create.append(employee)
+
+        if to_create:
+            insert_reviews(to_create, review_period_start, review_period_end)
+            invalidate_scopes([("employee", employee.name) for employee in to_create])
+            clear_inbox_counts([employee.manager for employee in to_create])
+            summary["created"] += len(to_create)
+
+        frappe.db.commit()
+
+        processed += len(employees)
+        frappe.publish_progress(processed * 100 / (total or 1),
+                                title="Generating Review Cycle",
+                                description=f"{processed} of {total} employees processed")
+
+    clear_cache_for_company(company)
+    log_system_event("Review cycle generated",
+                     f"{company} {department or ''} {review_period_start} to {review_period_end} - {summary}")
+    return summary
+
+def insert_reviews(employees, review_period_start, review_period_end):
+    """Insert Pending Review rows for `employees` with a single multi-row INSERT"""
+    names = reserve_review_names(len(employees))
+    timestamp = now()
+    user = frappe.session.user
+
+    fields = ["name", "owner", "modified_by", "creation", "modified", "docstatus", "naming_series",
+              "employee", "reviewer", "review_period_start", "review_period_end", "workflow_state",
+              "state_entered_at", "transition_history"]
+    transition_history = json.dumps([["Pending Review", timestamp, user]])
+    values = [
+        (name, user, user, timestamp, timestamp, 0, REVIEW_NAMING_SERIES,
+         employee.name, employee.manager, review_period_start, review_period_end, "Pending Review",
+         timestamp, transition_history)
+        for name, employee in zip(names, employees, strict=True)
+    ]
+    frappe.db.bulk_insert("Performance Review", fields=fields, values=values)
+
+def reserve_review_names(count):
+    """Reserve `count` consecutive names from the review naming series in one update"""
+    prefix = parse_naming_series(REVIEW_NAMING_SERIES)
+    frappe.db.sql("INSERT IGNORE INTO `tabSeries` (`name`, `current`) VALUES (%s, 0)", (prefix,))
+    current = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", (prefix,))[0][0]
+    frappe.db.sql("UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name` = %s", (count, prefix))
+
+    # Naming series without explicit digits use five, as frappe does when naming by series
+    return [f"{prefix}{number:05d}" for number in range(current + 1, current + count + 1)]
@@ -33,6 +33,26 @@ after_install = "company_management.company_management.install.after_install"
 # before_uninstall = "company_management.uninstall.before_uninstall"
 # after_uninstall = "company_management.uninstall.after_uninstall"
 
+# Permissions
+# -----------
+# Permissions evaluated in scripted ways
+
+permission_query_conditions = {
+	"CM Company": "company_management.company_management.auth.permissions.get_company_conditions",
+	"CM Department": "company_management.company_management.auth.permissions.get_department_conditions",
+	"CM Employee": "company_management.company_management.auth.permissions.get_employee_conditions",
+	"CM Project": "company_management.company_management.auth.permissions.get_project_conditions",
+	"Performance Review": "company_management.company_management.auth.permissions.get_performance_review_conditions"
+}
+
+has_permission = {
+	"CM Company": "company_management.company_management.auth.permissions.has_company_permission",
+	"CM Department": "company_management.company_management.auth.permissions.has_company_scoped_permission",
+	"CM Employee": "company_management.company_management.auth.permissions.has_company_scoped_permission",
+	"CM Project": "company_management.company_management.auth.permissions.has_company_scoped_permission",
+	"Performance Review": "company_management.company_management.auth.permissions.has_performance_review_permission"
+}
+
 # Document Events
 # ---------------
 # Hook on document methods and events
@@ -49,29 +69,81 @@ doc_events = {
 	},
 	"Project": {
 		"validate": "company_management.company_management.auth.security.validate_company_access"
+	},
+	"Custom DocPerm": {
+		"on_update": "company_management.company_management.auth.security.clear_permission_matrix",
+		"on_trash": "company_management.company_management.auth.security.clear_permission_matrix"
+	},
+	"DocPerm": {
+		"on_update": "company_management.company_management.auth.security.clear_permission_matrix",
+		"on_trash": "company_management.company_management.auth.security.clear_permission_matrix"
+	},
+	"User Account": {
+		"on_update": "company_management.company_management.auth.user_context.clear_user_context",
+		"on_trash": "company_management.company_management.auth.user_context.clear_user_context"
+	},
+	"CM Company": {
+		"on_update": "company_management.company_management.utils.cache.invalidate_cache_for_doc",
+		"on_trash": "company_management.company_management.utils.cache.invalidate_cache_for_doc"
+	},
+	"CM Department": {
+		"on_update": "company_management.company_management.utils.cache.invalidate_cache_for_doc",
+		"on_trash": "company_management.company_management.utils.cache.invalidate_cache_for_doc"
+	},
+	"CM Employee": {
+		"on_update": [
+			"company_management.company_management.auth.user_context.clear_user_context",
+			"company_management.company_management.utils.cache.invalidate_cache_for_doc"
+		],
+		"on_trash": [
+			"company_management.company_management.auth.user_context.clear_user_context",
+			"company_management.company_management.utils.cache.invalidate_cache_for_doc"
+		]
+	},
+	"CM Project": {
+		"on_update": "company_management.company_management.utils.cache.invalidate_cache_for_doc",
+		"on_trash": "company_management.company_management.utils.cache.invalidate_cache_for_doc"
+	},
+	"Workflow": {
+		"on_update": "company_management.company_management.workflow.engine.clear_transition_table",
+		"on_trash": "company_management.company_management.workflow.engine.clear_transition_table"
+	},
+	"Performance Review": {
+		"on_update": [
+			"company_management.company_management.utils.cache.invalidate_cache_for_doc",
+			"company_management.company_management.workflow.notifications.queue_transition_event",
+			"company_management.company_management.workflow.inbox.update_inbox_counts"
+		],
+		"on_update_after_submit": [
+			"company_management.company_management.utils.cache.invalidate_cache_for_doc",
+			"company_management.company_management.workflow.notifications.queue_transition_event",
+			"company_management.company_management.workflow.inbox.update_inbox_counts"
+		],
+		"on_cancel": "company_management.company_management.workflow.inbox.update_inbox_counts",
+		"on_trash": [
+			"company_management.company_management.utils.cache.invalidate_cache_for_doc",
+			"company_management.company_management.workflow.inbox.update_inbox_counts"
+		]
 	}
 }
 
+# Called from frappe.clear_cache(), e.g. after the Role Permission Manager edits permissions
+clear_cache = [
+	"company_management.company_management.auth.security.clear_permission_matrix",
+	"company_management.company_management.workflow.engine.clear_transition_table"
+]
+
 # Scheduled Tasks
 # ---------------
 
-# scheduler_events = {
-# 	"all": [
-# 		"company_management.tasks.all"
-# 	],
-# 	"daily": [
-# 		"company_management.tasks.daily"
-# 	],
-# 	"hourly": [
-# 		"company_management.tasks.hourly"
-# 	],
-# 	"weekly": [
-# 		"company_management.tasks.weekly"
-# 	],
-# 	"monthly": [
-# 		"company_management.tasks.monthly"
-# 	],
-# }
+scheduler_events = {
+	"hourly": [
+		"company_management.company_management.workflow.notifications.send_notification_digests"
+	],
+	"daily": [
+		"company_management.company_management.utils.counters.reconcile_counters"
+	],
+}
 
 # Testing
 # -------